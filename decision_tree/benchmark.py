@@ -0,0 +1,382 @@
+#####################
+#  Benchmark the decision tree code on testinput.txt scaled up synthetically, or on seeded generated rows (suite)
+#
+#  usage: python benchmark.py predict|binned|forest|sparse|presort [--sizes number of rows ...]
+#         python benchmark.py suite [--sizes number of rows ...] [--attributes A] [--classes C] [--no-memory]
+#                                   [--json results.json]
+#####################
+
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+#######################
+#   Load "decision tree ext.py" as a module (the space in the file name keeps it from being imported normally)
+#
+#   outputs: tree_ext: the loaded module
+######################
+
+def load_tree_ext():
+    spec = importlib.util.spec_from_file_location("tree_ext", os.path.join(here, "decision tree ext.py"))
+    tree_ext = importlib.util.module_from_spec(spec)
+    sys.modules["tree_ext"] = tree_ext     # worker processes look functions up by module name
+    spec.loader.exec_module(tree_ext)
+    return tree_ext
+
+
+#######################
+#   Make a larger data set by repeating the rows of testinput.txt and adding a little random noise to each copy
+#
+#   inputs: features: feature matrix to scale up
+#           labels: class label of each row
+#           n_rows: number of rows wanted
+#           seed: random seed, so runs are repeatable
+#   outputs: features, labels: n_rows of scaled up data
+######################
+
+def scale_rows(features, labels, n_rows, seed=0):
+    rng = numpy.random.default_rng(seed)
+    picks = numpy.arange(n_rows) % len(features)
+    return features[picks] + rng.normal(scale=0.05, size=(n_rows, features.shape[1])), labels[picks]
+
+
+#######################
+#   Seeded multi-class data in the format of testinput.txt.  Each class has a center of whole numbers from 1 to 5
+#   on every attribute and its rows are spread normally around it.  A test_fraction of the rows are test rows,
+#   labelled -1, whose real classes are returned separately.
+#
+#   inputs: file_name: file to write, one "label attribute:value ..." row per line
+#           n_rows: number of rows wanted
+#           n_attributes: number of attributes per row
+#           n_classes: number of classes (labelled 1 to n_classes)
+#           seed: random seed, so runs are repeatable
+#           test_fraction: share of the rows that are test rows
+#           chunk_size: rows per write
+#   outputs: test_classes: real class of each test row
+######################
+
+def write_rows_file(file_name, n_rows, n_attributes=8, n_classes=4, seed=0, test_fraction=0.1, chunk_size=65536):
+    rng = numpy.random.default_rng(seed)
+    centers = rng.integers(1, 6, size=(n_classes, n_attributes)).astype(numpy.float64)
+    row_format = "%d " + " ".join(f"{attribute}:%.6f" for attribute in range(n_attributes))
+
+    test_classes = []
+    with open(file_name, "w") as outputfile:
+        for start in range(0, n_rows, chunk_size):
+            n_chunk = min(chunk_size, n_rows - start)
+            classes = rng.integers(n_classes, size=n_chunk)
+            rows = numpy.empty((n_chunk, n_attributes + 1))
+            rows[:, 1:] = centers[classes] + rng.normal(scale=1.0, size=(n_chunk, n_attributes))
+            rows[:, 0] = classes + 1
+            is_test = rng.random(n_chunk) < test_fraction
+            rows[is_test, 0] = -1
+            test_classes.append(classes[is_test] + 1)
+            numpy.savetxt(outputfile, rows, fmt=row_format)
+    return numpy.concatenate(test_classes) if test_classes else numpy.zeros(0, dtype=numpy.int64)
+
+
+#######################
+#   Seeded sparse rows in the "label attribute:value ..." format: each row stores n_entries of n_attributes
+#   attributes (the rest are missing, meaning 0), and a stored attribute is larger on average when its number
+#   matches the row's class
+#
+#   inputs: n_rows: number of rows wanted
+#           n_attributes: number of attributes in all
+#           n_entries: attributes stored per row
+#           n_classes: number of classes (labelled 1 to n_classes)
+#           seed: random seed, so runs are repeatable
+#   outputs: lines: the rows as lines of text
+######################
+
+def make_sparse_lines(n_rows, n_attributes=1000, n_entries=10, n_classes=4, seed=0):
+    rng = numpy.random.default_rng(seed)
+    classes = rng.integers(n_classes, size=n_rows)
+    attributes = numpy.sort(rng.integers(n_attributes, size=(n_rows, n_entries)), axis=1)
+    values = rng.normal(size=(n_rows, n_entries)) + 2.0 * (attributes % n_classes == classes[:, numpy.newaxis])
+
+    lines = []
+    for row_class, row_attributes, row_values in zip((classes + 1).tolist(), attributes.tolist(), values.tolist()):
+        pairs = " ".join(f"{attribute}:{value:.4f}" for attribute, value in zip(row_attributes, row_values))
+        lines.append(f"{row_class} {pairs}\n")
+    return lines
+
+
+#######################
+#   Time one phase, then trace its peak memory in a second run.  A copy of measure_phase in k-means/benchmark.py
+#   (see there), kept here so each benchmark runs on its own.
+######################
+
+def measure_phase(phase_function, *args, track_memory=True):
+    start_time = time.perf_counter()
+    result = phase_function(*args)
+    seconds = time.perf_counter() - start_time
+
+    peak_mb = None
+    if track_memory:
+        tracemalloc.start()
+        phase_function(*args)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+#######################
+#   Git commit, versions and machine of a set of results.  A copy of run_info in k-means/benchmark.py.
+######################
+
+def run_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": numpy.__version__,
+            "platform": platform.platform(), "cores": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+#######################
+#   The phases of the main program: read and parse the data file, train, classify the test rows, write the results
+######################
+
+def load_rows(tree_ext, input_file):
+    with open(input_file, "r") as inputfile:
+        return tree_ext.parse_data_lines(inputfile.readlines())
+
+
+def classify_test_rows(tree_ext, root_node, test_features):
+    return tree_ext.FlatTree(root_node).predict(test_features)
+
+
+def write_results(tree_ext, output_file, test_classes):
+    with open(output_file, "w") as outputfile:
+        outputfile.write(tree_ext.format_results(test_classes))
+
+
+#######################
+#   Rows per second classified by classify_row one row at a time against FlatTree.predict on the whole batch
+######################
+
+def bench_predict(tree_ext, features, labels, attrib_list, sizes=(10 ** 5, 10 ** 6), max_depth=6):
+    training_data = tree_ext.make_training_or_test_data(labels, "training")
+    train_features, train_labels = scale_rows(features[training_data], labels[training_data], 2000)
+    root_node = tree_ext.build_tree(train_features, train_labels, numpy.arange(len(train_labels)),
+                                    attrib_list, max_depth)
+    flat_tree = tree_ext.FlatTree(root_node)
+
+    print("rows        loop (rows/s)   batch (rows/s)   speedup   same classes")
+    for n_rows in sizes:
+        test_features, test_labels = scale_rows(features, labels, n_rows, seed=1)
+
+        start_time = time.perf_counter()
+        loop_classes = [tree_ext.classify_row(root_node, feature_row) for feature_row in test_features]
+        loop_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        batch_classes = flat_tree.predict(test_features)
+        batch_time = time.perf_counter() - start_time
+
+        same = loop_classes == batch_classes.tolist()
+        print(f"{n_rows:<11d} {n_rows / loop_time:<15.0f} {n_rows / batch_time:<16.0f} "
+              f"{loop_time / batch_time:<9.1f} {same}")
+
+
+#######################
+#   Training time and accuracy of exact split search against histogram-binned split search
+######################
+
+def bench_binned(tree_ext, features, labels, attrib_list, sizes=(10 ** 4, 5 * 10 ** 4), max_depth=4, max_bins=64):
+    training_data = tree_ext.make_training_or_test_data(labels, "training")
+    print("rows        exact (s)   binned (s)   speedup   exact acc   binned acc   agreement")
+    for n_rows in sizes:
+        train_features, train_labels = scale_rows(features[training_data], labels[training_data], n_rows)
+        check_features, check_labels = scale_rows(features[training_data], labels[training_data], n_rows, seed=1)
+        rows = numpy.arange(n_rows)
+
+        start_time = time.perf_counter()
+        exact_tree = tree_ext.build_tree(train_features, train_labels, rows, attrib_list, max_depth)
+        exact_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        binned = tree_ext.BinnedFeatures(train_features, train_labels, rows, attrib_list, max_bins)
+        binned_tree = tree_ext.build_tree_binned(binned, rows, None, max_depth)
+        binned_time = time.perf_counter() - start_time
+
+        exact_classes = tree_ext.FlatTree(exact_tree).predict(check_features)
+        binned_classes = tree_ext.FlatTree(binned_tree).predict(check_features)
+        print(f"{n_rows:<11d} {exact_time:<11.3f} {binned_time:<12.3f} {exact_time / binned_time:<9.1f} "
+              f"{numpy.mean(exact_classes == check_labels):<11.3f} {numpy.mean(binned_classes == check_labels):<12.3f} "
+              f"{numpy.mean(exact_classes == binned_classes):.3f}")
+
+
+#######################
+#   Random forest training time as the number of trees and worker processes grow
+######################
+
+def bench_forest(tree_ext, features, labels, attrib_list, sizes=(5000,), n_trees_list=(10, 50, 100),
+                 n_jobs_list=(1, 2, 4, 8), max_depth=4):
+    training_data = tree_ext.make_training_or_test_data(labels, "training")
+    print(f"cores available: {os.cpu_count()}")
+    print("rows        trees   workers   fit (s)   speedup   accuracy")
+    for n_rows in sizes:
+        train_features, train_labels = scale_rows(features[training_data], labels[training_data], n_rows)
+        check_features, check_labels = scale_rows(features[training_data], labels[training_data], n_rows, seed=1)
+        for n_trees in n_trees_list:
+            base_time = None
+            for n_jobs in n_jobs_list:
+                start_time = time.perf_counter()
+                forest = tree_ext.RandomForest(n_trees, None, max_depth, random_state=0, n_jobs=n_jobs)
+                forest.fit(train_features, train_labels, numpy.arange(n_rows), attrib_list)
+                fit_time = time.perf_counter() - start_time
+                base_time = base_time or fit_time
+                accuracy = numpy.mean(forest.predict(check_features) == check_labels)
+                print(f"{n_rows:<11d} {n_trees:<7d} {n_jobs:<9d} {fit_time:<9.3f} {base_time / fit_time:<9.2f} {accuracy:.3f}")
+
+
+#######################
+#   Dense feature matrix against SparseFeatures on sparse rows with more and more attributes: parse, training
+#   and scoring time, peak memory, and whether both build the same tree
+######################
+
+def bench_sparse(tree_ext, features, labels, attrib_list, sizes=(5000,), n_attributes_list=(100, 1000, 4000),
+                 max_depth=6):
+    print("rows        attributes   form     parse (s)   fit (s)    predict (s)   peak (MB)   same tree")
+    for n_rows in sizes:
+        for n_attributes in n_attributes_list:
+            lines = make_sparse_lines(n_rows, n_attributes)
+            trees = []
+            for form, parse_lines in (("dense", tree_ext.parse_data_lines), ("sparse", tree_ext.parse_sparse_lines)):
+                (data_features, data_labels, data_attribs), parse_time, parse_mb = measure_phase(parse_lines, lines)
+                rows = numpy.arange(len(data_labels))
+                root_node, fit_time, fit_mb = measure_phase(tree_ext.build_tree, data_features, data_labels, rows,
+                                                            data_attribs, max_depth)
+                flat_tree = tree_ext.FlatTree(root_node)
+                test_classes, predict_time, predict_mb = measure_phase(flat_tree.predict, data_features)
+                trees.append(flat_tree)
+                same = "" if form == "dense" else all(numpy.array_equal(getattr(trees[0], name), getattr(flat_tree, name))
+                                                      for name in ("attribute", "value", "left", "right", "leaf_class"))
+                print(f"{n_rows:<11d} {n_attributes:<12d} {form:<8s} {parse_time:<11.3f} {fit_time:<10.3f} "
+                      f"{predict_time:<13.4f} {max(parse_mb, fit_mb, predict_mb):<11.1f} {same}")
+
+
+#######################
+#   Training time of exact split search, which sorts every attribute at every node, against the presorted builder,
+#   which sorts once at the root, for deeper and deeper trees, with the sort work the presorted builder saved
+######################
+
+def bench_presort(tree_ext, features, labels, attrib_list, sizes=(10 ** 5,), depths=(2, 4, 8, 12)):
+    training_data = tree_ext.make_training_or_test_data(labels, "training")
+    names = ("attribute", "value", "left", "right", "leaf_class")
+    print("rows        depth   exact (s)   presorted (s)   speedup   sorts avoided   values not sorted   same tree")
+    for n_rows in sizes:
+        train_features, train_labels = scale_rows(features[training_data], labels[training_data], n_rows)
+        rows = numpy.arange(n_rows)
+        for max_depth in depths:
+            start_time = time.perf_counter()
+            exact_tree = tree_ext.FlatTree(tree_ext.build_tree(train_features, train_labels, rows, attrib_list,
+                                                               max_depth))
+            exact_time = time.perf_counter() - start_time
+
+            for name in tree_ext.sort_counter:
+                tree_ext.sort_counter[name] = 0
+            start_time = time.perf_counter()
+            presorted = tree_ext.PresortedFeatures(train_features, train_labels, rows, attrib_list)
+            presorted_tree = tree_ext.FlatTree(tree_ext.build_tree_presorted(presorted, presorted.sorted_rows,
+                                                                             max_depth))
+            presorted_time = time.perf_counter() - start_time
+
+            same = all(numpy.array_equal(getattr(exact_tree, name), getattr(presorted_tree, name)) for name in names)
+            print(f"{n_rows:<11d} {max_depth:<7d} {exact_time:<11.3f} {presorted_time:<15.3f} "
+                  f"{exact_time / presorted_time:<9.2f} {tree_ext.sort_counter['sorts_avoided']:<15d} "
+                  f"{tree_ext.sort_counter['values_sort_avoided']:<19d} {same}")
+
+
+#######################
+#   Timing and peak memory of each phase (load, fit, predict, write) on seeded generated rows, for comparing
+#   versions.  Returns one result record per size, which --json saves.
+######################
+
+def bench_suite(tree_ext, features, labels, attrib_list, sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6), n_attributes=8,
+                n_classes=4, max_depth=6, seed=0, track_memory=True):
+    records = []
+    print("rows        A     C     load (s)   fit (s)    predict (s)   write (s)   accuracy   peak (MB)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_file = os.path.join(tmpdir, "rows.txt")
+        output_file = os.path.join(tmpdir, "results.txt")
+        for n_rows in sizes:
+            real_classes = write_rows_file(input_file, n_rows, n_attributes, n_classes, seed)
+
+            seconds = {}
+            peak_mb = {}
+            (features, labels, attrib_list), seconds["load"], peak_mb["load"] = measure_phase(
+                load_rows, tree_ext, input_file, track_memory=track_memory)
+            training_data = tree_ext.make_training_or_test_data(labels, "training")
+            test_data = tree_ext.make_training_or_test_data(labels, "test")
+            root_node, seconds["fit"], peak_mb["fit"] = measure_phase(
+                tree_ext.build_tree, features, labels, training_data, attrib_list, max_depth, track_memory=track_memory)
+            test_classes, seconds["predict"], peak_mb["predict"] = measure_phase(
+                classify_test_rows, tree_ext, root_node, features[test_data], track_memory=track_memory)
+            result, seconds["write"], peak_mb["write"] = measure_phase(
+                write_results, tree_ext, output_file, test_classes, track_memory=track_memory)
+
+            accuracy = float(numpy.mean(test_classes == real_classes)) if len(real_classes) > 0 else None
+            records.append({"algorithm": "decision tree", "rows": n_rows, "attributes": n_attributes,
+                            "classes": n_classes, "max_depth": max_depth, "seed": seed, "seconds": seconds,
+                            "peak_mb": peak_mb, "test_rows": len(test_data), "accuracy": accuracy})
+            peak_text = f"{max(peak_mb.values()):.1f}" if track_memory else "-"
+            accuracy_text = f"{accuracy:.3f}" if accuracy is not None else "-"
+            print(f"{n_rows:<11d} {n_attributes:<5d} {n_classes:<5d} {seconds['load']:<10.3f} {seconds['fit']:<10.3f} "
+                  f"{seconds['predict']:<13.3f} {seconds['write']:<11.3f} {accuracy_text:<10s} {peak_text}")
+    return records
+
+
+benchmarks = {
+    "predict": bench_predict,
+    "binned": bench_binned,
+    "forest": bench_forest,
+    "sparse": bench_sparse,
+    "presort": bench_presort,
+    "suite": bench_suite,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="decision tree benchmarks")
+    parser.add_argument("benchmark", choices=sorted(benchmarks))
+    parser.add_argument("--sizes", type=int, nargs="+", help="numbers of rows to test (each benchmark has a default)")
+    parser.add_argument("--attributes", type=int, default=8, help="attributes per generated row (suite)")
+    parser.add_argument("--classes", type=int, default=4, help="number of generated classes (suite)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the second, traced run of each phase that measures peak memory (suite)")
+    parser.add_argument("--json", help="also save the results to this JSON file (suite)")
+    args = parser.parse_args()
+
+    tree_ext = load_tree_ext()
+    with open(os.path.join(here, "testinput.txt"), "r") as inputfile:
+        features, labels, attrib_list = tree_ext.parse_data_lines(inputfile.readlines())
+
+    bench_args = {}
+    if args.sizes:
+        bench_args["sizes"] = args.sizes
+    if args.benchmark == "suite":
+        bench_args["n_attributes"] = args.attributes
+        bench_args["n_classes"] = args.classes
+        bench_args["track_memory"] = not args.no_memory
+    records = benchmarks[args.benchmark](tree_ext, features, labels, attrib_list, **bench_args)
+
+    if args.json and records is not None:
+        with open(args.json, "w") as outputfile:
+            json.dump({"run": run_info(), "results": records}, outputfile, indent=2)
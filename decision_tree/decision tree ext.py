@@ -1,32 +1,189 @@
 ####
 #   Thomas Wright   tgw4@illinois.edu
 #   Decision Tree Classifier
-#   Create a height = 2 (root node and 2 levels of decision nodes) decision tree.
+#   Create a decision tree, by default height = 2 (root node and 2 levels of decision nodes), deeper if asked.
 #   Train with training data to find optimal decision attributes and decision values
 #   Then run test data through the model to see if it classifies the data correctly
 ####
 
+import argparse
+import hashlib
+import itertools
+import json
+import os
 import time
 import sys
 import math
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy
+
+#######################
+#   Parse the input lines into a dense feature matrix and a label vector.
+#   Each line is "label attribute:value attribute:value ...".  Attribute numbers are used directly as column
+#   numbers of the matrix, and any attribute missing from a line is left at 0.0.
+#   The lines are parsed in bulk: colons are turned into spaces and the whole block of text is converted to
+#   numbers in one numpy call, then the counts of colons per line tell which numbers belong to which row.
+#
+#   inputs: input_lines: lines of text data
+#           n_columns: number of matrix columns to make (attributes past the last column are dropped);
+#                      by default just enough for the largest attribute number
+#   outputs: features: rows x columns array of attribute values (float64)
+#            labels: array of the class label of each row (int64, -1 for test data)
+#            attrib_list: sorted list of the attribute numbers that appear in the data
+######################
+
+def parse_data_lines(input_lines, n_columns=None):
+    labels, row_numbers, attribute_numbers, values, n_columns = parse_pairs(input_lines, n_columns)
+
+    features = numpy.zeros((len(labels), n_columns), dtype=numpy.float64)
+    features[row_numbers, attribute_numbers] = values
+    attrib_list = numpy.unique(attribute_numbers).tolist()
+
+    return features, labels, attrib_list
+
+
+
+
+#######################
+#   The bulk parsing behind parse_data_lines and parse_sparse_lines: every "attribute:value" pair of the lines
+#   as parallel arrays.
+#
+#   inputs: input_lines: lines of text data
+#           n_columns: number of attribute columns to keep (pairs with larger attribute numbers are dropped);
+#                      by default just enough for the largest attribute number
+#   outputs: labels: array of the class label of each row
+#            row_numbers, attribute_numbers, values: row, attribute number and value of each pair
+#            n_columns: number of attribute columns
+######################
+
+def parse_pairs(input_lines, n_columns=None):
+    input_lines = [line for line in input_lines if not line.isspace() and line != ""]
+
+    pair_counts = numpy.array([line.count(":") for line in input_lines], dtype=numpy.intp)
+    numbers = numpy.fromstring(" ".join(input_lines).replace(":", " "), dtype=numpy.float64, sep=" ")
+
+    line_starts = numpy.zeros(len(input_lines), dtype=numpy.intp)    # position of each line's label in numbers
+    line_starts[1:] = numpy.cumsum(1 + 2 * pair_counts)[:-1]
+    is_pair = numpy.ones(len(numbers), dtype=bool)
+    is_pair[line_starts] = False
+
+    labels = numbers[line_starts].astype(numpy.int64)
+    pairs = numbers[is_pair]
+    attribute_numbers = pairs[0::2].astype(numpy.intp)
+    values = pairs[1::2]
+    row_numbers = numpy.repeat(numpy.arange(len(input_lines)), pair_counts)
+
+    if n_columns is None:
+        n_columns = int(attribute_numbers.max()) + 1 if len(attribute_numbers) > 0 else 0
+    else:
+        in_range = attribute_numbers < n_columns
+        row_numbers, attribute_numbers, values = row_numbers[in_range], attribute_numbers[in_range], values[in_range]
+
+    return labels, row_numbers, attribute_numbers, values, n_columns
+
+
+
+
+#######################
+#   Parse the input lines into a sparse (CSR) feature matrix instead of a dense one, for data with many attributes
+#   of which each row only has a few.  Memory, training and scoring then grow with the number of entries rather
+#   than rows x attributes.
+#
+#   inputs: input_lines: lines of text data
+#           n_columns: number of attribute columns, as in parse_data_lines
+#           default: value of every attribute missing from a line
+#   outputs: features: SparseFeatures of the rows
+#            labels: array of the class label of each row (int64, -1 for test data)
+#            attrib_list: sorted list of the attribute numbers that appear in the data
+######################
+
+def parse_sparse_lines(input_lines, n_columns=None, default=0.0):
+    labels, row_numbers, attribute_numbers, values, n_columns = parse_pairs(input_lines, n_columns)
+
+    features = SparseFeatures(len(labels), row_numbers, attribute_numbers, values, n_columns, default)
+    attrib_list = numpy.unique(attribute_numbers).tolist()
+
+    return features, labels, attrib_list
+
+
+
+
+#######################
+#   Sparse feature matrix in CSR form: the entries of row r are indices/values[indptr[r]:indptr[r + 1]], sorted
+#   by attribute number.  An attribute a row has no entry for has the default value, and entries equal to the
+#   default are not stored.  build_tree, split_data, split_data_to_right_left and FlatTree.predict accept it in
+#   place of the dense feature matrix.
+#
+#   inputs: n_rows: number of rows
+#           row_numbers, attribute_numbers, values: row, attribute number and value of each entry (any order; for
+#                                                   an attribute given twice in a row the last one is kept, as in
+#                                                   the dense matrix)
+#           n_columns: number of attribute columns
+#           default: value of the attributes that are not stored
+######################
+
+class SparseFeatures:
+    __slots__ = ("indptr", "indices", "values", "n_columns", "default", "entry_keys")
+
+    def __init__(self, n_rows, row_numbers, attribute_numbers, values, n_columns, default=0.0):
+        order = numpy.lexsort((attribute_numbers, row_numbers))
+        entry_keys = row_numbers[order].astype(numpy.int64) * n_columns + attribute_numbers[order]
+        keep = numpy.ones(len(order), dtype=bool)
+        keep[:-1] = entry_keys[1:] != entry_keys[:-1]    # last of any repeated attribute in a row
+        order, entry_keys = order[keep], entry_keys[keep]
+
+        stored = values[order] != default
+        order, entry_keys = order[stored], entry_keys[stored]
+
+        self.indices = numpy.asarray(attribute_numbers[order], dtype=numpy.intp)
+        self.values = numpy.asarray(values[order], dtype=numpy.float64)
+        self.indptr = numpy.zeros(n_rows + 1, dtype=numpy.intp)
+        self.indptr[1:] = numpy.cumsum(numpy.bincount(row_numbers[order], minlength=n_rows))
+        self.n_columns = n_columns
+        self.default = default
+        self.entry_keys = entry_keys    # row * n_columns + attribute of each entry, ascending, for lookups
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    # every stored entry of the given rows: position of its row in rows, its attribute number and its value
+    def row_entries(self, rows):
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        positions = numpy.repeat(numpy.arange(len(rows)), lengths)
+        entries = numpy.arange(lengths.sum()) + numpy.repeat(starts - (numpy.cumsum(lengths) - lengths), lengths)
+        return positions, self.indices[entries], self.values[entries]
+
+    # value of the given attribute (one per row, or one for all) of each given row
+    def lookup(self, rows, attributes):
+        targets = numpy.asarray(rows, dtype=numpy.int64) * self.n_columns + attributes
+        if len(self.entry_keys) == 0:
+            return numpy.full(len(targets), self.default)
+        found_at = numpy.minimum(numpy.searchsorted(self.entry_keys, targets), len(self.entry_keys) - 1)
+        return numpy.where(self.entry_keys[found_at] == targets, self.values[found_at], self.default)
+
+    # a SparseFeatures of only the given rows, in the given order
+    def select_rows(self, rows):
+        positions, attributes, values = self.row_entries(rows)
+        return SparseFeatures(len(rows), positions, attributes, values, self.n_columns, self.default)
+
+
+
 
 #######################
 #   Splits off the training or test portion of the input data, as requested.
-#   Split is based on the first element of each list.  -1 is test data, anything else is trainig data.
+#   Split is based on the label of each row.  -1 is test data, anything else is trainig data.
 #
-#   inputs: list_to_split: (data list to be split into atest or training sublist)
+#   inputs: labels: (class labels of the data to be split into a test or training subset)
 #           dataset_type: indicates whether to split into training or test sets
-#   outputs: new_data_list: the test or training dataset
+#   outputs: rows: the row numbers of the test or training dataset
 ######################
 
-def make_training_or_test_data(list_to_split, dataset_type):
-    new_data_list = []
-    for data_row in list_to_split:
-        if data_row[0] >= 0 and dataset_type == "training":
-            new_data_list.append(data_row)
-        elif data_row[0] < 0 and dataset_type == "test":
-            new_data_list.append(data_row)
-    return(new_data_list)
+def make_training_or_test_data(labels, dataset_type):
+    if dataset_type == "training":
+        return numpy.flatnonzero(labels >= 0)
+    return numpy.flatnonzero(labels < 0)
 
 
 
@@ -38,31 +195,87 @@ def make_training_or_test_data(list_to_split, dataset_type):
 #   outputs: info_sum: entropy value of the list
 ######################
 
+entropy_counter = {"evaluations": 0, "candidate_splits": 0}   # entropy values computed and split points tried, for instrumenting training runs
+
+# each top-level tree build starts its counts from 0, so they cover one training run
+def reset_entropy_counter():
+    for name in entropy_counter:
+        entropy_counter[name] = 0
+
+
 def calc_info(class_count_list):
 
     info_sum = 0.0
+    total = sum(class_count_list)
 
     for i in class_count_list:
         if (i != 0):
-            info_calc = -(i/sum(class_count_list))*math.log(i/sum(class_count_list),2)
+            info_calc = -(i/total)*math.log(i/total,2)
             info_sum += info_calc
+    entropy_counter["evaluations"] += 1
     return(info_sum)
 
 
 
 
 #######################
-#   Extract the attributes from the dataset and create a list of just those attributes
+#   Table of n * log2(n) for the integers 0, 1, 2, ... (0 for n = 0), grown as larger counts are needed
 #
-#   inputs: data_list: (dataset to extract attributes from)
-#   outputs: attributes: list of attributes
+#   inputs: max_count: largest count that will be looked up
+#   outputs: the table, with at least max_count + 1 entries
 ######################
 
-def create_attrib_list(data_list):
-    attributes = []
-    for i in range(1, len(data_list[0])):
-        attributes.append(data_list[0][i][0])
-    return attributes
+nlogn_table = numpy.zeros(1)
+
+def get_nlogn_table(max_count):
+    global nlogn_table
+    if len(nlogn_table) <= max_count:
+        n = numpy.arange(max(max_count + 1, 2 * len(nlogn_table)), dtype=numpy.float64)
+        nlogn_table = numpy.zeros(len(n))
+        nlogn_table[1:] = n[1:] * numpy.log2(n[1:])
+    return nlogn_table
+
+
+
+
+#######################
+#   Info (entropy) of many candidate splits at once, from arrays of class counts.
+#   For a side with n points and class counts c, n * entropy = n*log2(n) - sum(c*log2(c)), so with a lookup table
+#   of n*log2(n) the weighted info of a split is
+#       (T[n_left] - sum T[c_left] + T[n_right] - sum T[c_right]) / (n_left + n_right)
+#   with no logs computed per split.
+#
+#   inputs: left_counts: splits x classes array of class counts to the left of each split point
+#           right_counts: splits x classes array of class counts to the right of each split point
+#   outputs: info: array of the weighted info of each split
+######################
+
+def calc_split_info(left_counts, right_counts):
+    left_sizes = left_counts.sum(axis=1)
+    right_sizes = right_counts.sum(axis=1)
+    table = get_nlogn_table(int((left_sizes + right_sizes).max(initial=0)))
+
+    info = (table[left_sizes] - table[left_counts].sum(axis=1)
+            + table[right_sizes] - table[right_counts].sum(axis=1)) / (left_sizes + right_sizes)
+    entropy_counter["evaluations"] += 2 * len(info)
+    return info
+
+
+
+
+#######################
+#   Position of the lowest info among candidate splits.  The table formula of calc_split_info can round
+#   mathematically equal infos differently in the last bits, so infos within info_tolerance of the lowest are
+#   taken as ties and the first of them wins, keeping ties broken by split position.
+#
+#   inputs: info: array of the info of each split
+#   outputs: position of the first split that ties the lowest info
+######################
+
+info_tolerance = 1e-12
+
+def first_lowest(info):
+    return int(numpy.flatnonzero(info <= info.min() + info_tolerance)[0])
 
 
 
@@ -75,12 +288,8 @@ def create_attrib_list(data_list):
 ######################
 
 def make_split_list(input_list):
-    split_list = []
-    input_list = list(set(input_list))    # drop out duplicate values, if any
-    input_list.sort()   # sort list in ascending order
-    for i in range(len(input_list)-1):
-
-        split_list.append((input_list[i]+input_list[i+1])/2)   # calculate spot halfway between points
+    input_list = numpy.unique(input_list)    # drop out duplicate values, if any, and sort in ascending order
+    split_list = (input_list[:-1] + input_list[1:]) / 2    # calculate spot halfway between points
 
     return(split_list)
 
@@ -90,53 +299,75 @@ def make_split_list(input_list):
 #   Use the split points calculated previously and then find the info(entropy) value for each split.
 #   Choose the one with the lowest entropy value for the attribute.
 #
-#   inputs:     input_list: data set to split
-#               classes: the classes for the given data set
-#               class_list_uniques:  list of just the unique values of the classes
+#   The data points are sorted once, and the split points and class counts are both taken from the sorted order
+#   by sweep_sorted_splits.
+#
+#   inputs:     input_list: array of attribute values to split
+#               classes: array of the classes for the given data set
+#               class_list_uniques:  sorted array of just the unique values of the classes
 #   outputs:    lowest_info:  the lowest info value found
 #               split:  the best attribute split point
 #               split_left_counts:  count of classes for data to the left of the split point
 #               split_right_counts: count of classes for data to the right of the split point
 ######################
 
+sort_counter = {"sorts": 0, "values_sorted": 0, "sorts_avoided": 0, "values_sort_avoided": 0,
+                "comparisons_avoided": 0}   # attribute sorts done and skipped (see PresortedFeatures)
+
 def process_splits_for_info(input_list, classes, class_list_uniques):
 
-    split_list = make_split_list(input_list)
+    sorted_order = numpy.argsort(input_list, kind="stable")    # sort data points once
+    sort_counter["sorts"] += 1
+    sort_counter["values_sorted"] += len(input_list)
 
-    best_split = []
-    lowest_info = 9999.99    # pick an initial point far above any actual info value we'd encounter
+    sorted_classes = numpy.searchsorted(class_list_uniques, classes[sorted_order])
+    return(sweep_sorted_splits(input_list[sorted_order], sorted_classes, len(class_list_uniques)))
 
 
-    for split in split_list:
-        split_left_counts = []
-        split_right_counts = []
-        for m in range(len(class_list_uniques)):    # set initial counts to zero
-            split_left_counts.append(0)
-            split_right_counts.append(0)
-        for i in range(len(input_list)):
-            data_point = input_list[i]
 
-            if data_point <= split:
-                for k in range(len(class_list_uniques)):
-                    if class_list_uniques[k] == classes[i]:
-                        split_left_counts[k] += 1
-            else:
-                for k in range(len(class_list_uniques)):
-                    if class_list_uniques[k] == classes[i]:
-                        split_right_counts[k] += 1
 
-        ##### calculate the info(entropy) score for data the falls to the left and right sides of the split point
-        info_split_left = calc_info(split_left_counts)*(sum(split_left_counts)/(sum(split_left_counts)+sum(split_right_counts)))
-        info_split_right = calc_info(split_right_counts)*(sum(split_right_counts)/(sum(split_left_counts)+sum(split_right_counts)))
+#######################
+#   Find the best split point of one attribute from its values already in ascending order.
+#   The split points are halfway between the distinct values, and the class counts are accumulated along the
+#   sorted order, so the counts to the left of any split point are a single lookup (the counts to the right are
+#   the total minus the left) instead of a rescan of every point per split point.  The info of all split points
+#   is then computed together by calc_split_info.
+#
+#   inputs:     sorted_values: attribute values in ascending order
+#               sorted_classes: class number (position in the node's sorted class list) of each value
+#               n_classes: number of classes at the node
+#   outputs:    [lowest info, split point, left class counts, right class counts], or empty if the values are
+#               all the same
+######################
+
+def sweep_sorted_splits(sorted_values, sorted_classes, n_classes):
+
+    distinct = numpy.ones(len(sorted_values), dtype=bool)
+    distinct[1:] = sorted_values[1:] != sorted_values[:-1]
+    distinct_values = sorted_values[distinct]
+    split_list = (distinct_values[:-1] + distinct_values[1:]) / 2    # calculate spot halfway between points
+    entropy_counter["candidate_splits"] += len(split_list)
 
+    if len(split_list) == 0:
+        return([])
 
-        info_split = info_split_left + info_split_right    # total info score is sum of left and right sides
+    ##### running class counts: row m holds the class counts of the first m sorted points
+    running_counts = numpy.zeros((len(sorted_values) + 1, n_classes), dtype=numpy.int64)
+    running_counts[numpy.arange(1, len(sorted_values) + 1), sorted_classes] = 1
+    numpy.cumsum(running_counts, axis=0, out=running_counts)
+    total_counts = running_counts[-1]
 
-        if (info_split < lowest_info):
-            lowest_info = info_split
-            best_split_list = [lowest_info, split, split_left_counts, split_right_counts]
+    ##### number of points at or below (<=) each split point, so those counts are the left side of the split
+    left_sizes = numpy.searchsorted(sorted_values, split_list, side="right")
+    split_left_counts = running_counts[left_sizes]
+    split_right_counts = total_counts - split_left_counts
 
-            best_split = best_split_list.copy()
+    ##### info(entropy) score of every split point at once, keep the first lowest one
+    info_split = calc_split_info(split_left_counts, split_right_counts)
+    best = first_lowest(info_split)
+
+    best_split = [float(info_split[best]), float(split_list[best]),
+                  split_left_counts[best].tolist(), split_right_counts[best].tolist()]
     return(best_split)
 
 
@@ -146,57 +377,40 @@ def process_splits_for_info(input_list, classes, class_list_uniques):
 #   split the current training data based on the best split attribute and split point previously found
 #   inputs:
 #           split_attribute:     details of the split point attribute and values to use for splitting the data
-#           data_to_split:      the data list to split into two parts
+#           features:       the feature matrix
+#           rows_to_split:  the row numbers of the data to split into two parts
 #   outputs:
-#           data_return:    list of 2 lists that contain the left and right portions of the split data
+#           data_return:    list of 2 arrays that contain the row numbers of the left and right portions of the split data
 ######################
 
-def split_data_to_right_left(split_attribute, data_to_split):
-    data_left = []
-    data_right = []
-    data_return = []
-
-
-    for item in data_to_split:
-        for i in range(1, len(item)):
+def split_data_to_right_left(split_attribute, features, rows_to_split):
+    if isinstance(features, SparseFeatures):
+        goes_left = features.lookup(rows_to_split, split_attribute[0]) <= split_attribute[2]
+    else:
+        goes_left = features[rows_to_split, split_attribute[0]] <= split_attribute[2]
 
-            if item[i][0] == split_attribute[0]:
-                if item[i][1] <= split_attribute[2]:
-                    data_left.append(item)
-                else:
-                    data_right.append(item)
-    data_return.append(data_left)
-    data_return.append(data_right)
+    data_left = rows_to_split[goes_left]
+    data_right = rows_to_split[~goes_left]
 
-    return(data_return)
+    return([data_left, data_right])
 
 
 
 #######################
-#   count the occurences of each class in the provided data list
+#   count the occurences of each class in the provided labels
 #   inputs:
-#           data_list:     list of data to count the frequency of classes in
+#           class_labels:     array of class labels to count the frequency of classes in
 #   outputs:
 #           class_list_counted:    list of classes and frequency counts of each class in the data
 ######################
 
-def class_counter(data_list):
-    class_list = []
-    class_list_counted = []
-
-
-    for item in data_list:
-        if item[0] not in class_list:
-            class_list.append(item[0])
+def class_counter(class_labels):
+    lowest_class = int(class_labels.min()) if len(class_labels) > 0 else 0
+    counts = numpy.bincount(class_labels - lowest_class)
 
-    for item in class_list:
-        append_item = [item, 0]
-        class_list_counted.append(append_item)
-
-    for item in data_list:
-        for i in range(len(class_list)):
-            if item[0] == class_list[i]:
-                class_list_counted[i][1] += 1
+    class_list_counted = []
+    for item in numpy.flatnonzero(counts).tolist():
+        class_list_counted.append([item + lowest_class, int(counts[item])])
 
     return(class_list_counted)
 
@@ -229,49 +443,208 @@ def maximum_count(data_list):
 
 
 #######################
-#   take the training data, find the best attribute and attribute value for each attribute, then find best
-#   of all attributes to use for the split
+#   worker side of ParallelSplitter: attach to the shared feature matrix, labels and node rows once when the worker starts,
+#   then find the best split of one attribute per task
+######################
+
+shared_arrays = {}
+
+def attach_shared_arrays(features_name, features_shape, labels_name, labels_shape, rows_name):
+    features_shm = shared_memory.SharedMemory(name=features_name)
+    labels_shm = shared_memory.SharedMemory(name=labels_name)
+    rows_shm = shared_memory.SharedMemory(name=rows_name)
+    shared_arrays["shm"] = (features_shm, labels_shm, rows_shm)    # keep the blocks open while the arrays are in use
+    shared_arrays["features"] = numpy.ndarray(features_shape, dtype=numpy.float64, buffer=features_shm.buf)
+    shared_arrays["labels"] = numpy.ndarray(labels_shape, dtype=numpy.int64, buffer=labels_shm.buf)
+    shared_arrays["rows"] = numpy.ndarray(labels_shape, dtype=numpy.intp, buffer=rows_shm.buf)
+
+
+def evaluate_attribute(attribute, n_rows, class_list_uniques):
+    features = shared_arrays["features"]
+    labels = shared_arrays["labels"]
+    rows_to_split = shared_arrays["rows"][:n_rows]
+    split_result = process_splits_for_info(features[rows_to_split, attribute], labels[rows_to_split], class_list_uniques)
+    return [attribute] + split_result
+
+
+
+#######################
+#   evaluate the attributes of a split on several cores.  The feature matrix and labels are copied once into
+#   shared memory, and each node's row numbers are written once into a shared block of their own; each task only
+#   sends an attribute number and the number of rows, and gets back that attribute's best split.
 #   inputs:
-#           data_to_split:     list of the training data
+#           features:   the feature matrix
+#           labels:     the class label of every row of the feature matrix
+#           n_jobs:     number of worker processes
+#   use as: with ParallelSplitter(features, labels, n_jobs) as splitter:
+#               all_best_splits = splitter.evaluate(rows_to_split, attrib_list, class_list_uniques)
+######################
+
+class ParallelSplitter:
+
+    def __init__(self, features, labels, n_jobs):
+        self.features_shm = shared_memory.SharedMemory(create=True, size=max(1, features.nbytes))
+        self.labels_shm = shared_memory.SharedMemory(create=True, size=max(1, labels.nbytes))
+        self.rows_shm = shared_memory.SharedMemory(create=True, size=max(1, len(labels) * numpy.dtype(numpy.intp).itemsize))
+        shared_features = numpy.ndarray(features.shape, dtype=numpy.float64, buffer=self.features_shm.buf)
+        shared_features[:] = features
+        shared_labels = numpy.ndarray(labels.shape, dtype=numpy.int64, buffer=self.labels_shm.buf)
+        shared_labels[:] = labels
+        del shared_features, shared_labels    # release the buffers, the workers make their own views
+        self.shared_rows = numpy.ndarray(labels.shape, dtype=numpy.intp, buffer=self.rows_shm.buf)
+
+        self.pool = multiprocessing.Pool(n_jobs, initializer=attach_shared_arrays,
+                                         initargs=(self.features_shm.name, features.shape,
+                                                   self.labels_shm.name, labels.shape, self.rows_shm.name))
+
+    # the workers are idle between calls, so the node's rows can be written over the previous node's
+    def evaluate(self, rows_to_split, attrib_list, class_list_uniques):
+        if len(rows_to_split) > len(self.shared_rows):
+            raise ValueError("a node has more rows than the data (repeated row numbers are not supported)")
+        self.shared_rows[:len(rows_to_split)] = rows_to_split
+        return self.pool.starmap(evaluate_attribute,
+                                 [(attribute, len(rows_to_split), class_list_uniques) for attribute in attrib_list])
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.features_shm.close()
+        self.features_shm.unlink()
+        self.labels_shm.close()
+        self.labels_shm.unlink()
+        del self.shared_rows
+        self.rows_shm.close()
+        self.rows_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+
+#######################
+#   split_data for SparseFeatures.  Only the stored entries of the node's rows are looked at: they are grouped by
+#   attribute and value with their class counts, and each attribute gets one more group for the rows that do not
+#   store it (the default value), with the node's class counts minus the stored ones.  The split points are halfway
+#   between neighbouring groups of an attribute, and all of them are scored in one calc_split_info call.  Ties are
+#   broken as in split_data, so the tree is the same as from the dense matrix of the same data.
+#   inputs:
+#           features:       SparseFeatures of the data
+#           labels:         the class label of every row
+#           rows_to_split:  row numbers of the data at this node
+#           attrib_list:    attribute numbers to consider
 #   outputs:
-#           split_to_use:    the best split point , and its value
+#           split_to_use:    [attribute, info, split point, left class counts, right class counts],
+#                            or empty if no attribute can be split
 ######################
 
-def split_data(data_to_split):
-    class_list = []
+def split_sparse(features, labels, rows_to_split, attrib_list):
+    class_list_uniques, row_classes = numpy.unique(labels[rows_to_split], return_inverse=True)
+    n_classes = len(class_list_uniques)
+    total_counts = numpy.bincount(row_classes, minlength=n_classes)
+
+    positions, attributes, values = features.row_entries(rows_to_split)
+    wanted = numpy.zeros(features.n_columns, dtype=bool)
+    wanted[attrib_list] = True
+    keep = wanted[attributes]
+    positions, attributes, values = positions[keep], attributes[keep], values[keep]
+
+    ##### group the stored entries by attribute and value, with the class counts of each group
+    order = numpy.lexsort((values, attributes))
+    attributes, values, entry_classes = attributes[order], values[order], row_classes[positions[order]]
+    new_group = numpy.ones(len(order), dtype=bool)
+    new_group[1:] = (attributes[1:] != attributes[:-1]) | (values[1:] != values[:-1])
+    group_starts = numpy.flatnonzero(new_group)
+    group_numbers = numpy.cumsum(new_group) - 1
+    group_counts = numpy.bincount(group_numbers * n_classes + entry_classes,
+                                  minlength=len(group_starts) * n_classes).reshape(len(group_starts), n_classes)
+    group_attributes = attributes[group_starts]
+    group_values = values[group_starts]
+
+    ##### one more group per attribute for the rows that do not store it
+    present, first_groups = numpy.unique(group_attributes, return_index=True)
+    if len(present) == 0:
+        return []
+    default_counts = total_counts - numpy.add.reduceat(group_counts, first_groups, axis=0)
+    has_default = default_counts.sum(axis=1) > 0
+    group_attributes = numpy.concatenate((group_attributes, present[has_default]))
+    group_values = numpy.concatenate((group_values, numpy.full(numpy.count_nonzero(has_default), features.default)))
+    group_counts = numpy.concatenate((group_counts, default_counts[has_default]))
+    order = numpy.lexsort((group_values, group_attributes))
+    group_attributes, group_values, group_counts = group_attributes[order], group_values[order], group_counts[order]
+
+    ##### class counts at or below each group within its attribute, and the split points between groups
+    first_of_attribute = numpy.ones(len(group_attributes), dtype=bool)
+    first_of_attribute[1:] = group_attributes[1:] != group_attributes[:-1]
+    attribute_start = numpy.maximum.accumulate(numpy.where(first_of_attribute, numpy.arange(len(group_attributes)), 0))
+    running_counts = numpy.cumsum(group_counts, axis=0)
+    left_counts = running_counts - running_counts[attribute_start] + group_counts[attribute_start]
+
+    split_groups = numpy.flatnonzero(~first_of_attribute[1:])    # groups followed by another of the same attribute
+    entropy_counter["candidate_splits"] += len(split_groups)
+    if len(split_groups) == 0:
+        return []
+    split_attributes = group_attributes[split_groups]
+    split_points = (group_values[split_groups] + group_values[split_groups + 1]) / 2
+    split_left_counts = left_counts[split_groups]
+    split_right_counts = total_counts - split_left_counts
+
+    ##### lowest info (within info_tolerance), then the smaller attribute label, then the first split point of it
+    info_split = calc_split_info(split_left_counts, split_right_counts)
+    lowest = numpy.flatnonzero(info_split <= info_split.min() + info_tolerance)
+    best = lowest[numpy.lexsort((split_groups[lowest], split_attributes[lowest]))[0]]
+
+    return [int(split_attributes[best]), float(info_split[best]), float(split_points[best]),
+            split_left_counts[best].tolist(), split_right_counts[best].tolist()]
+
+
 
-    for data_row in data_to_split:
-        class_list.append(data_row[0])
 
-    class_list_uniques = list(set(class_list))
+#######################
+#   take the training data, find the best attribute and attribute value for each attribute, then find best
+#   of all attributes to use for the split
+#   inputs:
+#           features:       the feature matrix (or SparseFeatures, see split_sparse)
+#           labels:         the class label of every row of the feature matrix
+#           rows_to_split:  row numbers of the training data to split
+#           attrib_list:    attribute numbers (feature matrix columns) to consider
+#           splitter:       optional ParallelSplitter holding the same features and labels, to evaluate the
+#                           attributes in parallel
+#   outputs:
+#           split_to_use:    the best split point , and its value (empty if no attribute can be split)
+######################
 
-    class_instance_counts = []
+def split_data(features, labels, rows_to_split, attrib_list, splitter=None):
+    if isinstance(features, SparseFeatures):
+        return split_sparse(features, labels, rows_to_split, attrib_list)
 
-    for item in class_list_uniques:
-        class_instance_counts.append(class_list.count(item))
+    class_list = labels[rows_to_split]
 
-    attrib_list = create_attrib_list(data_table)
+    class_list_uniques = numpy.unique(class_list)
 
-    all_best_splits = []
+    if splitter is not None:
+        all_best_splits = splitter.evaluate(rows_to_split, attrib_list, class_list_uniques)
+    else:
+        all_best_splits = []
 
-    for i in range(len(attrib_list)):
-        curr_attribs = []
-        best_split_for_attrib = []
-        for k in range(len(data_to_split)):  # find split points     # was training_data instead of data_to_split
-            curr_attribs.append(data_to_split[k][i + 1][1])     # was training_data instead of data_to_split
-        best_split_for_attrib.append(attrib_list[i])
+        for attribute in attrib_list:
+            best_split_for_attrib = [attribute]
 
-        split_result = process_splits_for_info(curr_attribs, class_list, class_list_uniques)
+            split_result = process_splits_for_info(features[rows_to_split, attribute], class_list, class_list_uniques)
 
-        for item in split_result:
-            best_split_for_attrib.append(item)
-        all_best_splits.append(best_split_for_attrib)
+            for item in split_result:
+                best_split_for_attrib.append(item)
+            all_best_splits.append(best_split_for_attrib)
 
     split_to_use = []
     split_to_use_value = 9999.9         # pick a value far above any that would actually happen for initial value
 
     for item in all_best_splits:    # loop through all the best points of each attribute, finding the best overall across all attributes
-        if item[1] == split_to_use_value:    # resolve ties by using smaller label, as per instructions
+        if len(item) == 1:    # every row has the same value for this attribute, so there is nothing to split on
+            continue
+        if abs(item[1] - split_to_use_value) <= info_tolerance:    # resolve ties by using smaller label, as per instructions
             if item[0] < split_to_use[0]:
                 split_to_use = item
         elif item[1] < split_to_use_value:
@@ -282,6 +655,668 @@ def split_data(data_to_split):
     return (split_to_use)
 
 
+#######################
+#   one node of the decision tree.  A decision node has an attribute and split value and two child nodes,
+#   a leaf node only has the class to assign to data that reaches it.
+######################
+
+class TreeNode:
+    __slots__ = ("attribute", "value", "left", "right", "leaf_class")
+
+    def __init__(self, attribute=None, value=None, left=None, right=None, leaf_class=None):
+        self.attribute = attribute
+        self.value = value
+        self.left = left
+        self.right = right
+        self.leaf_class = leaf_class
+
+    def is_leaf(self):
+        return self.left is None
+
+
+
+#######################
+#   send the telemetry of one built node to a callback
+#   inputs:
+#           callback:       function to call as callback("node", info)
+#           depth:          level of the node (the root is level 1)
+#           rows:           row numbers of the training data at the node
+#           candidates:     number of split points tried (None if not known)
+#           split_to_use:   best split found, empty if none was searched for or found
+#           make_leaf:      whether the node became a leaf
+#           node_start:     time.perf_counter() when the node was started
+######################
+
+def report_node(callback, depth, rows, candidates, split_to_use, make_leaf, node_start):
+    callback("node", {"depth": depth, "rows": len(rows), "candidate_splits": candidates,
+                      "best_info": split_to_use[1] if len(split_to_use) > 0 else None,
+                      "attribute": split_to_use[0] if len(split_to_use) > 0 else None,
+                      "leaf": make_leaf, "seconds": time.perf_counter() - node_start})
+
+
+
+#######################
+#   build the decision tree below a node, splitting the data recursively until a stopping rule is reached:
+#   the node has only one class, the tree is max_depth deep, there are too few rows to split, no attribute can
+#   be split, or the best split gains less info than min_info_gain.  A node that stops becomes a leaf with the
+#   most common class of its data (ties go to the smaller class label).
+#   inputs:
+#           features:       the feature matrix
+#           labels:         the class label of every row of the feature matrix
+#           rows:           row numbers of the training data at this node
+#           attrib_list:    attribute numbers (feature matrix columns) to consider
+#           max_depth:      most levels of decision nodes below this one
+#           min_samples_split:  fewest rows a node needs to be split
+#           min_info_gain:  smallest drop in info (entropy) a split must give
+#           splitter:       optional ParallelSplitter to evaluate the attributes of each split in parallel
+#           callback:       optional function called as callback("node", info) as each node is built (see report_node)
+#           depth:          level of this node (the root is level 1)
+#   outputs:
+#           node:    the root node of the built (sub)tree
+######################
+
+def build_tree(features, labels, rows, attrib_list, max_depth=2, min_samples_split=2, min_info_gain=0.0,
+               splitter=None, callback=None, depth=1):
+    node_start = time.perf_counter()
+    if depth == 1:
+        reset_entropy_counter()
+    candidates_before = entropy_counter["candidate_splits"]
+    class_count = class_counter(labels[rows])
+    split_to_use = []
+
+    make_leaf = len(class_count) == 1 or max_depth == 0 or len(rows) < min_samples_split
+    if not make_leaf:
+        split_to_use = split_data(features, labels, rows, attrib_list, splitter)   # find the best split
+        make_leaf = (len(split_to_use) == 0 or
+                     calc_info([item[1] for item in class_count]) - split_to_use[1] < min_info_gain)
+
+    if callback is not None:   # split points tried by worker processes are not counted here
+        candidates = None if splitter is not None else entropy_counter["candidate_splits"] - candidates_before
+        report_node(callback, depth, rows, candidates, split_to_use, make_leaf, node_start)
+
+    if make_leaf:
+        return TreeNode(leaf_class=maximum_count(class_count)[0])
+
+    left_right_data = split_data_to_right_left(split_to_use, features, rows)   # split data into left and right parts
+
+    return TreeNode(attribute=split_to_use[0],
+                    value=split_to_use[2],
+                    left=build_tree(features, labels, left_right_data[0], attrib_list, max_depth - 1,
+                                    min_samples_split, min_info_gain, splitter, callback, depth + 1),
+                    right=build_tree(features, labels, left_right_data[1], attrib_list, max_depth - 1,
+                                     min_samples_split, min_info_gain, splitter, callback, depth + 1))
+
+
+
+#######################
+#   run one row of data down the tree to find its class
+#   inputs:
+#           node:       root node of the tree
+#           feature_row:    the row's attribute values, indexed by attribute number
+#   outputs:
+#           the class of the leaf the row ends up in
+######################
+
+def classify_row(node, feature_row):
+    while not node.is_leaf():
+        if feature_row[node.attribute] <= node.value:
+            node = node.left
+        else:
+            node = node.right
+    return node.leaf_class
+
+
+#######################
+#   training data quantized for histogram-based split finding.  Each attribute is cut into at most max_bins bins
+#   once, up front, and the only split points considered later are the bin edges.  The edges are halfway
+#   between neighboring data values (like make_split_list), placed at quantiles of the attribute's values, so an
+#   attribute with no more than max_bins distinct values keeps every one of its exact split points.
+#   inputs:
+#           features:       the feature matrix
+#           labels:         the class label of every row of the feature matrix
+#           rows:           row numbers of the training data
+#           attrib_list:    attribute numbers (feature matrix columns) to consider
+#           max_bins:       most bins per attribute
+#   arrays:
+#           thresholds:     list of the split points (bin edges) of each attribute
+#           bins:           bin number of every training row for every attribute (training rows x attributes),
+#                           uint8 for up to 256 bins and uint16 above, so it is smaller than the feature matrix
+#           offsets:        where each attribute's bins start in a node histogram
+#           class_list:     sorted unique class labels of the training data
+#           class_index:    position of each training row's class in class_list
+#           row_positions:  position in bins and class_index of each row number (-1 for rows not in training)
+######################
+
+class BinnedFeatures:
+    __slots__ = ("attrib_list", "thresholds", "bins", "offsets", "class_list", "class_index", "row_positions")
+
+    def __init__(self, features, labels, rows, attrib_list, max_bins=255):
+        self.attrib_list = list(attrib_list)
+        self.thresholds = []
+        bin_type = numpy.uint8 if max_bins <= 256 else numpy.uint16 if max_bins <= 65536 else numpy.intp
+        self.bins = numpy.zeros((len(rows), len(self.attrib_list)), dtype=bin_type)
+
+        for i in range(len(self.attrib_list)):
+            column = features[:, self.attrib_list[i]]
+            split_list = make_split_list(column[rows])
+            if len(split_list) >= max_bins:   # too many split points, keep the ones closest to the quantiles
+                quantiles = numpy.quantile(column[rows], numpy.linspace(0, 1, max_bins + 1)[1:-1])
+                split_list = numpy.unique(split_list[numpy.minimum(numpy.searchsorted(split_list, quantiles),
+                                                                   len(split_list) - 1)])
+            self.thresholds.append(split_list)
+            self.bins[:, i] = numpy.searchsorted(split_list, column[rows], side="left")   # value <= edge b  <=>  bin <= b
+
+        self.offsets = numpy.zeros(len(self.attrib_list) + 1, dtype=numpy.intp)
+        self.offsets[1:] = numpy.cumsum([len(split_list) + 1 for split_list in self.thresholds])
+
+        self.class_list = numpy.unique(labels[rows])
+        self.class_index = numpy.searchsorted(self.class_list, labels[rows])
+        self.row_positions = numpy.full(len(labels), -1, dtype=numpy.intp)
+        self.row_positions[rows] = numpy.arange(len(rows))
+
+    # class counts in every bin of every attribute for the given rows, with one bincount over all attributes
+    def histogram(self, rows):
+        n_classes = len(self.class_list)
+        positions = self.row_positions[rows]
+        cells = (self.bins[positions] + self.offsets[:-1]) * n_classes + self.class_index[positions, numpy.newaxis]
+        counts = numpy.bincount(cells.ravel(), minlength=self.offsets[-1] * n_classes)
+        return counts.reshape(self.offsets[-1], n_classes)
+
+
+
+#######################
+#   find the best split of a node from its histogram, only trying the bin edges as split points.
+#   Ties are broken the same way as split_data: the first (smallest) split point of an attribute, then the
+#   smaller attribute label.
+#   inputs:
+#           binned:     the BinnedFeatures of the training data
+#           histogram:  class counts of the node in every bin of every attribute
+#   outputs:
+#           split_to_use:    [attribute, info, split point, left class counts, right class counts, bin number],
+#                            or empty if no attribute can be split
+######################
+
+def split_histogram(binned, histogram):
+    split_to_use = []
+    split_to_use_value = 9999.9         # pick a value far above any that would actually happen for initial value
+
+    for i in range(len(binned.attrib_list)):
+        left_counts = numpy.cumsum(histogram[binned.offsets[i]:binned.offsets[i + 1] - 1], axis=0)
+        total_counts = histogram[binned.offsets[i]:binned.offsets[i + 1]].sum(axis=0)
+
+        right_counts = total_counts - left_counts
+        real_splits = numpy.flatnonzero((left_counts.sum(axis=1) > 0) & (right_counts.sum(axis=1) > 0))   # data on both sides
+        entropy_counter["candidate_splits"] += len(real_splits)
+        if len(real_splits) == 0:
+            continue
+
+        info_split = calc_split_info(left_counts[real_splits], right_counts[real_splits])
+        best = first_lowest(info_split)
+        b = real_splits[best]
+        lowest_info = float(info_split[best])
+
+        if lowest_info < split_to_use_value - info_tolerance:   # attributes are in ascending order, so ties keep the smaller label
+            split_to_use_value = lowest_info
+            split_to_use = [binned.attrib_list[i], lowest_info, float(binned.thresholds[i][b]),
+                            left_counts[b].tolist(), right_counts[b].tolist(), int(b)]
+
+    return split_to_use
+
+
+
+#######################
+#   build the decision tree below a node like build_tree, but finding splits from histograms of the binned data.
+#   Only the smaller child's histogram is counted from its rows; the larger child's is the parent's histogram
+#   minus the smaller one.
+#   inputs:
+#           binned:     the BinnedFeatures of the training data
+#           rows:       row numbers of the training data at this node
+#           histogram:  class counts of the node in every bin of every attribute (counted here if not given)
+#           max_depth, min_samples_split, min_info_gain:  stopping rules, as in build_tree
+#           callback, depth:    node telemetry, as in build_tree
+#   outputs:
+#           node:    the root node of the built (sub)tree
+######################
+
+def build_tree_binned(binned, rows, histogram=None, max_depth=2, min_samples_split=2, min_info_gain=0.0,
+                      callback=None, depth=1):
+    node_start = time.perf_counter()
+    if depth == 1:
+        reset_entropy_counter()
+    candidates_before = entropy_counter["candidate_splits"]
+    if histogram is None:
+        histogram = binned.histogram(rows)
+
+    class_totals = histogram[binned.offsets[0]:binned.offsets[1]].sum(axis=0)
+    class_count = [[item, count] for item, count in zip(binned.class_list.tolist(), class_totals.tolist()) if count > 0]
+    split_to_use = []
+
+    make_leaf = len(class_count) == 1 or max_depth == 0 or len(rows) < min_samples_split
+    if not make_leaf:
+        split_to_use = split_histogram(binned, histogram)   # find the best split
+        make_leaf = (len(split_to_use) == 0 or
+                     calc_info([item[1] for item in class_count]) - split_to_use[1] < min_info_gain)
+
+    if callback is not None:
+        report_node(callback, depth, rows, entropy_counter["candidate_splits"] - candidates_before, split_to_use,
+                    make_leaf, node_start)
+
+    if make_leaf:
+        return TreeNode(leaf_class=maximum_count(class_count)[0])
+
+    goes_left = binned.bins[binned.row_positions[rows], binned.attrib_list.index(split_to_use[0])] <= split_to_use[5]
+    left_rows = rows[goes_left]
+    right_rows = rows[~goes_left]
+
+    if len(left_rows) <= len(right_rows):   # count the smaller side, subtract to get the other
+        left_histogram = binned.histogram(left_rows)
+        right_histogram = histogram - left_histogram
+    else:
+        right_histogram = binned.histogram(right_rows)
+        left_histogram = histogram - right_histogram
+
+    return TreeNode(attribute=split_to_use[0],
+                    value=split_to_use[2],
+                    left=build_tree_binned(binned, left_rows, left_histogram, max_depth - 1,
+                                           min_samples_split, min_info_gain, callback, depth + 1),
+                    right=build_tree_binned(binned, right_rows, right_histogram, max_depth - 1,
+                                            min_samples_split, min_info_gain, callback, depth + 1))
+
+
+
+#######################
+#   the training rows sorted by every attribute once, at the root, for build_tree_presorted (as in the SLIQ and
+#   SPRINT tree builders).  A node holds one sorted row list per attribute; splitting the node partitions each list
+#   stably into its children, which keeps them sorted, so no node below the root sorts anything.
+#   inputs:
+#           features:       the feature matrix
+#           labels:         the class label of every row of the feature matrix
+#           rows:           row numbers of the training data
+#           attrib_list:    attribute numbers (feature matrix columns) to consider
+#   use as:
+#           presorted = PresortedFeatures(features, labels, rows, attrib_list)
+#           root_node = build_tree_presorted(presorted, presorted.sorted_rows, max_depth)
+######################
+
+class PresortedFeatures:
+    __slots__ = ("features", "labels", "attrib_list", "sorted_rows")
+
+    def __init__(self, features, labels, rows, attrib_list):
+        self.features = features
+        self.labels = labels
+        self.attrib_list = list(attrib_list)
+        self.sorted_rows = numpy.empty((len(self.attrib_list), len(rows)), dtype=numpy.intp)   # one list per attribute
+        for i in range(len(self.attrib_list)):
+            self.sorted_rows[i] = rows[numpy.argsort(features[rows, self.attrib_list[i]], kind="stable")]
+        sort_counter["sorts"] += len(self.attrib_list)
+        sort_counter["values_sorted"] += len(self.attrib_list) * len(rows)
+
+    # the sorted row lists of the two children, in the same order as the parent's
+    def partition(self, sorted_rows, left_rows):
+        goes_left = numpy.zeros(len(self.labels), dtype=bool)
+        goes_left[left_rows] = True
+        in_left = goes_left[sorted_rows]
+        n_left = numpy.count_nonzero(in_left[0]) if len(sorted_rows) > 0 else 0
+        return (sorted_rows[in_left].reshape(len(sorted_rows), n_left),
+                sorted_rows[~in_left].reshape(len(sorted_rows), sorted_rows.shape[1] - n_left))
+
+
+
+#######################
+#   find the best split of a node from its presorted row lists, as split_data does but without sorting.  The sorts
+#   that split_data would have done are added to sort_counter as avoided.
+#   inputs:
+#           presorted:      the PresortedFeatures of the training data
+#           sorted_rows:    the node's rows sorted by each attribute
+#   outputs:
+#           split_to_use:    [attribute, info, split point, left class counts, right class counts],
+#                            or empty if no attribute can be split
+######################
+
+def split_presorted(presorted, sorted_rows):
+    n_rows = sorted_rows.shape[1]
+    class_list_uniques = numpy.unique(presorted.labels[sorted_rows[0]])
+    sort_counter["sorts_avoided"] += len(presorted.attrib_list)
+    sort_counter["values_sort_avoided"] += len(presorted.attrib_list) * n_rows
+    sort_counter["comparisons_avoided"] += len(presorted.attrib_list) * int(get_nlogn_table(n_rows)[n_rows])
+
+    split_to_use = []
+    split_to_use_value = 9999.9         # pick a value far above any that would actually happen for initial value
+
+    for i in range(len(presorted.attrib_list)):
+        attribute_rows = sorted_rows[i]
+        sorted_classes = numpy.searchsorted(class_list_uniques, presorted.labels[attribute_rows])
+        split_result = sweep_sorted_splits(presorted.features[attribute_rows, presorted.attrib_list[i]],
+                                           sorted_classes, len(class_list_uniques))
+        if len(split_result) == 0:    # every row has the same value for this attribute, so there is nothing to split on
+            continue
+        if split_result[0] < split_to_use_value - info_tolerance:   # attributes are in ascending order, so ties keep the smaller label
+            split_to_use_value = split_result[0]
+            split_to_use = [presorted.attrib_list[i]] + split_result
+
+    return split_to_use
+
+
+
+#######################
+#   build the decision tree below a node like build_tree, but from presorted row lists that are partitioned into
+#   the children instead of sorted again at every node.  Gives the same tree as build_tree.
+#   inputs:
+#           presorted:      the PresortedFeatures of the training data
+#           sorted_rows:    the node's rows sorted by each attribute (presorted.sorted_rows at the root)
+#           max_depth, min_samples_split, min_info_gain:  stopping rules, as in build_tree
+#           callback, depth:    node telemetry, as in build_tree
+#   outputs:
+#           node:    the root node of the built (sub)tree
+######################
+
+def build_tree_presorted(presorted, sorted_rows, max_depth=2, min_samples_split=2, min_info_gain=0.0,
+                         callback=None, depth=1):
+    node_start = time.perf_counter()
+    if depth == 1:
+        reset_entropy_counter()
+    candidates_before = entropy_counter["candidate_splits"]
+    rows = sorted_rows[0] if len(sorted_rows) > 0 else numpy.zeros(0, dtype=numpy.intp)
+    class_count = class_counter(presorted.labels[rows])
+    split_to_use = []
+
+    make_leaf = len(class_count) == 1 or max_depth == 0 or len(rows) < min_samples_split
+    if not make_leaf:
+        split_to_use = split_presorted(presorted, sorted_rows)   # find the best split
+        make_leaf = (len(split_to_use) == 0 or
+                     calc_info([item[1] for item in class_count]) - split_to_use[1] < min_info_gain)
+
+    if callback is not None:
+        report_node(callback, depth, rows, entropy_counter["candidate_splits"] - candidates_before, split_to_use,
+                    make_leaf, node_start)
+
+    if make_leaf:
+        return TreeNode(leaf_class=maximum_count(class_count)[0])
+
+    left_right_data = split_data_to_right_left(split_to_use, presorted.features, rows)
+    left_sorted_rows, right_sorted_rows = presorted.partition(sorted_rows, left_right_data[0])
+
+    return TreeNode(attribute=split_to_use[0],
+                    value=split_to_use[2],
+                    left=build_tree_presorted(presorted, left_sorted_rows, max_depth - 1, min_samples_split,
+                                              min_info_gain, callback, depth + 1),
+                    right=build_tree_presorted(presorted, right_sorted_rows, max_depth - 1, min_samples_split,
+                                               min_info_gain, callback, depth + 1))
+
+
+
+#######################
+#   the decision tree flattened into arrays, one entry per node, so a whole batch of rows can be run down the
+#   tree together with numpy instead of one row at a time.  Node 0 is the root; a leaf has attribute -1.
+#   inputs:
+#           root_node:  root TreeNode of a built tree
+#   arrays:
+#           attribute, value:   split attribute and split value of each decision node
+#           left, right:        node numbers of the children of each decision node
+#           leaf_class:         class of each leaf node
+######################
+
+class FlatTree:
+    __slots__ = ("attribute", "value", "left", "right", "leaf_class")
+
+    def __init__(self, root_node):
+        nodes = [root_node]
+        for node in nodes:    # number the nodes breadth first, nodes keeps growing as children are added
+            if not node.is_leaf():
+                nodes.append(node.left)
+                nodes.append(node.right)
+        node_numbers = {id(node): number for number, node in enumerate(nodes)}
+
+        self.attribute = numpy.full(len(nodes), -1, dtype=numpy.intp)
+        self.value = numpy.zeros(len(nodes), dtype=numpy.float64)
+        self.left = numpy.zeros(len(nodes), dtype=numpy.intp)
+        self.right = numpy.zeros(len(nodes), dtype=numpy.intp)
+        self.leaf_class = numpy.zeros(len(nodes), dtype=numpy.int64)
+
+        for number, node in enumerate(nodes):
+            if node.is_leaf():
+                self.leaf_class[number] = node.leaf_class
+            else:
+                self.attribute[number] = node.attribute
+                self.value[number] = node.value
+                self.left[number] = node_numbers[id(node.left)]
+                self.right[number] = node_numbers[id(node.right)]
+
+    # classify every row of the feature matrix, moving all rows that have not reached a leaf down one level at a time
+    def predict(self, features):
+        node = numpy.zeros(len(features), dtype=numpy.intp)
+        active = numpy.flatnonzero(self.attribute[node] >= 0)
+
+        while len(active) > 0:
+            active_nodes = node[active]
+            if isinstance(features, SparseFeatures):
+                goes_left = features.lookup(active, self.attribute[active_nodes]) <= self.value[active_nodes]
+            else:
+                goes_left = features[active, self.attribute[active_nodes]] <= self.value[active_nodes]
+            node[active] = numpy.where(goes_left, self.left[active_nodes], self.right[active_nodes])
+            active = active[self.attribute[node[active]] >= 0]
+
+        return self.leaf_class[node]
+
+    # rebuild a flattened tree from its saved arrays (see load_model)
+    @classmethod
+    def from_arrays(cls, attribute, value, left, right, leaf_class):
+        flat_tree = cls.__new__(cls)
+        flat_tree.attribute = attribute
+        flat_tree.value = value
+        flat_tree.left = left
+        flat_tree.right = right
+        flat_tree.leaf_class = leaf_class
+        return flat_tree
+
+
+
+#######################
+#   fingerprint of the training data and tree settings, stored with a saved model so a model trained on
+#   different data (or with different settings) is recognized as stale
+#   inputs:
+#           features:   the feature matrix (or SparseFeatures)
+#           labels:     the class label of every row of the feature matrix
+#           rows:       row numbers of the training data
+#           settings:   anything else the tree depends on (depth limits, split mode, ...)
+#   outputs:
+#           sha256 hex digest
+######################
+
+def hash_training_data(features, labels, rows, settings):
+    digest = hashlib.sha256()
+    digest.update(repr(settings).encode())
+    if isinstance(features, SparseFeatures):
+        training_features = features.select_rows(rows)
+        for array in (training_features.indptr, training_features.indices, training_features.values):
+            digest.update(array.tobytes())
+    else:   # only the columns the training rows use, so attributes that only test rows have do not count
+        training_features = features[rows]
+        columns = numpy.flatnonzero((training_features != 0).any(axis=0))
+        digest.update(columns.astype(numpy.int64).tobytes())
+        digest.update(numpy.ascontiguousarray(training_features[:, columns]).tobytes())
+    digest.update(numpy.ascontiguousarray(labels[rows]).tobytes())
+    return digest.hexdigest()
+
+
+
+#######################
+#   save a trained tree to a compact .npz file, along with the hash of the data it was trained on
+#   inputs:
+#           model_file_name:    file to write
+#           flat_tree:          the FlatTree to save
+#           training_hash:      hash_training_data of the training data
+######################
+
+def save_model(model_file_name, flat_tree, training_hash):
+    with open(model_file_name, "wb") as modelfile:
+        numpy.savez_compressed(modelfile, attribute=flat_tree.attribute, value=flat_tree.value, left=flat_tree.left,
+                               right=flat_tree.right, leaf_class=flat_tree.leaf_class,
+                               training_hash=numpy.array(training_hash))
+
+
+
+#######################
+#   load a tree saved by save_model
+#   inputs:
+#           model_file_name:    file to read
+#   outputs:
+#           flat_tree:          the saved FlatTree
+#           training_hash:      hash of the data the tree was trained on
+######################
+
+def load_model(model_file_name):
+    with numpy.load(model_file_name) as saved:
+        flat_tree = FlatTree.from_arrays(saved["attribute"], saved["value"], saved["left"], saved["right"],
+                                         saved["leaf_class"])
+        training_hash = str(saved["training_hash"])
+    return flat_tree, training_hash
+
+
+#######################
+#   worker side of RandomForest: the training data is handed to each worker once when it starts (inherited rather
+#   than pickled where processes are forked), then each task trains one tree
+######################
+
+forest_data = {}
+
+def set_forest_data(features, labels):
+    forest_data["features"] = features
+    forest_data["labels"] = labels
+
+
+def train_forest_tree(rows, attrib_list, max_depth, min_samples_split, min_info_gain):
+    root_node = build_tree(forest_data["features"], forest_data["labels"], rows, attrib_list, max_depth,
+                           min_samples_split, min_info_gain)
+    return FlatTree(root_node), dict(entropy_counter)    # the tree's own counts, also from worker processes
+
+
+
+#######################
+#   random forest: many decision trees, each trained on a bootstrap sample of the training rows (drawn with
+#   replacement) using a random subset of the attributes, classifying by majority vote of the trees.  Vote ties
+#   go to the smaller class label, the same as maximum_count.
+#   inputs:
+#           n_trees:        number of trees
+#           max_features:   attributes per tree (default: square root of the number of attributes)
+#           max_depth, min_samples_split, min_info_gain:  stopping rules for each tree, as in build_tree
+#           random_state:   seed for the bootstrap samples and attribute subsets
+#           n_jobs:         worker processes to train trees in parallel (1 trains them all in this process)
+#   after fit:
+#           trees:          FlatTree of every tree
+#           class_list:     sorted class labels of the training data
+######################
+
+class RandomForest:
+
+    def __init__(self, n_trees=10, max_features=None, max_depth=2, min_samples_split=2, min_info_gain=0.0,
+                 random_state=None, n_jobs=1):
+        self.n_trees = n_trees
+        self.max_features = max_features
+        self.max_depth = max_depth
+        self.min_samples_split = min_samples_split
+        self.min_info_gain = min_info_gain
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+    def fit(self, features, labels, rows, attrib_list):
+        rng = numpy.random.default_rng(self.random_state)
+        max_features = self.max_features or max(1, int(math.sqrt(len(attrib_list))))
+
+        tasks = []
+        for i in range(self.n_trees):
+            tree_rows = numpy.sort(rng.choice(rows, size=len(rows), replace=True))
+            tree_attribs = sorted(rng.choice(attrib_list, size=min(max_features, len(attrib_list)), replace=False).tolist())
+            tasks.append((tree_rows, tree_attribs, self.max_depth, self.min_samples_split, self.min_info_gain))
+
+        if self.n_jobs > 1:
+            with multiprocessing.Pool(self.n_jobs, initializer=set_forest_data, initargs=(features, labels)) as pool:
+                results = pool.starmap(train_forest_tree, tasks)
+        else:
+            set_forest_data(features, labels)
+            results = [train_forest_tree(*task) for task in tasks]
+            forest_data.clear()
+        self.trees = [flat_tree for flat_tree, counts in results]
+        for name in entropy_counter:    # the whole forest counts as one training run
+            entropy_counter[name] = sum(counts[name] for flat_tree, counts in results)
+
+        self.class_list = numpy.unique(labels[rows])
+        return self
+
+    def predict(self, features):
+        votes = numpy.zeros((len(features), len(self.class_list)), dtype=numpy.int64)
+        for flat_tree in self.trees:
+            tree_classes = numpy.searchsorted(self.class_list, flat_tree.predict(features))
+            votes[numpy.arange(len(features)), tree_classes] += 1
+        return self.class_list[numpy.argmax(votes, axis=1)]    # argmax takes the first (smallest) class on a tie
+
+
+#######################
+#   format the classification results, one line per test point, as one string ready to write out
+#   inputs:
+#           test_classes:   array of the class of each test point
+#           first_point:    number of the first test point
+#   outputs:
+#           the output text
+######################
+
+def format_results(test_classes, first_point=0):
+    output_lines = []
+    for testing_counter, test_class in enumerate(test_classes.tolist(), first_point):
+        output_lines.append(f"Testing point  {testing_counter}  belongs to class:  {test_class}\n")
+    return "".join(output_lines)
+
+
+
+#######################
+#   classify rows with a pre-trained tree as they arrive, a chunk of lines at a time, so memory stays bounded no
+#   matter how much data is piped through.  Every row is classified (its label is ignored), and each chunk's
+#   results go out in one write.
+#   inputs:
+#           flat_tree:      the trained FlatTree
+#           input_stream:   lines of "label attribute:value ..." data, such as sys.stdin
+#           output_stream:  where to write the results, such as sys.stdout
+#           chunk_size:     lines per chunk
+#   outputs:
+#           testing_counter:    number of rows classified
+######################
+
+def classify_stream(flat_tree, input_stream, output_stream, chunk_size=65536):
+    n_columns = max(1, flat_tree.attribute.max() + 1)    # columns the tree can look at
+    testing_counter = 0
+
+    while True:
+        lines = list(itertools.islice(input_stream, chunk_size))
+        if len(lines) == 0:
+            break
+        features, labels, attrib_list = parse_data_lines(lines, n_columns)
+        output_stream.write(format_results(flat_tree.predict(features), testing_counter))
+        testing_counter += len(features)
+
+    output_stream.flush()
+    return testing_counter
+
+
+
+#######################
+#   structured telemetry log, used as the callback of build_tree and called directly for other phases.  A copy of
+#   TelemetryLog in k-means/k-means ext.py (see there), kept here so this script runs on its own.
+######################
+
+class TelemetryLog:
+
+    def __init__(self, outputfile):
+        self.outputfile = outputfile
+        self.start_time = time.perf_counter()
+
+    def __call__(self, event, info):
+        record = {"event": event, "elapsed": time.perf_counter() - self.start_time}
+        record.update(info)
+        self.outputfile.write(json.dumps(record) + "\n")
+        self.outputfile.flush()
+
+
+
 ##################
 #  main program
 #
@@ -290,39 +1325,72 @@ def split_data(data_to_split):
 if __name__ == "__main__":
     start_time = time.time()
 
-    input_type = "file"  # set whether to use file input for testing, or stdin for autograder
-    timing = False
-    if timing:
+    parser = argparse.ArgumentParser(description="decision tree on labelled rows of index:value attributes, "
+                                                 "training on the rows with a class and classifying the rest")
+    parser.add_argument("data_file", nargs="?", default="testinput.txt",
+                        help="input rows, or - to read them from stdin (as the autograder does)")
+    parser.add_argument("--stream", action="store_true",
+                        help="classify rows from stdin chunk by chunk with the tree saved in --model, no training")
+    parser.add_argument("--model", metavar="MODEL_FILE",
+                        help="save the trained tree here and reuse it while the training data is unchanged "
+                             "(e.g. tree_model.npz)")
+    parser.add_argument("--max-depth", type=int, default=2, help="levels of decision nodes (the root is level 1)")
+    parser.add_argument("--min-samples-split", type=int, default=2,
+                        help="fewest training rows a node needs before it is split")
+    parser.add_argument("--min-info-gain", type=float, default=0.0,
+                        help="smallest info (entropy) drop a split must give")
+    parser.add_argument("--split-mode", choices=["exact", "binned", "presorted"], default="exact",
+                        help="exact tries every split point, binned only bin edges from histograms (faster on big "
+                             "data), presorted tries every split point like exact but sorts the data only once "
+                             "(faster for deep trees)")
+    parser.add_argument("--max-bins", type=int, default=255, help="most bins per attribute in binned mode")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes to evaluate split attributes in parallel (exact mode), "
+                             "or to train forest trees")
+    parser.add_argument("--forest-trees", type=int, default=0,
+                        help="train a random forest of this many trees instead of a single tree (0 for a single tree)")
+    parser.add_argument("--sparse", action="store_true",
+                        help="keep the data sparse (for many attributes with few per row), exact split mode "
+                             "without --jobs only")
+    parser.add_argument("--sparse-default", type=float, default=0.0,
+                        help="value of an attribute missing from a row, with --sparse")
+    parser.add_argument("--timing", action="store_true",
+                        help="write timing of each phase and tree node to stderr, as lines of JSON")
+    args = parser.parse_args()
+    if args.stream and (args.model is None or not os.path.exists(args.model)):
+        parser.error("--stream needs a saved model, give --model and train it first")
+    if args.sparse and (args.split_mode != "exact" or (args.jobs > 1 and args.forest_trees == 0)):
+        parser.error("--sparse works with exact split mode in one process only")
+
+    telemetry = None
+    if args.timing:
         start_time = time.time()
+        telemetry = TelemetryLog(sys.stderr)
 
 
-    if (input_type == "file"):   # read from file for testing, stdin for autograder
+    if args.stream:   # score stdin chunk by chunk with the saved tree, no training
+        flat_tree, training_hash = load_model(args.model)
+        rows_classified = classify_stream(flat_tree, sys.stdin, sys.stdout)
+        if telemetry is not None:
+            telemetry("stream", {"rows": rows_classified, "seconds": time.time() - start_time})
+        exit(0)
+
+    if args.sparse:
+        parse_lines = lambda lines: parse_sparse_lines(lines, default=args.sparse_default)
+    else:
+        parse_lines = parse_data_lines
+
+    phase_start = time.perf_counter()
+    if (args.data_file != "-"):   # read from file for testing, stdin for autograder
 
         ####
         # read from file
         ####
-        inputfile = open("testinput.txt", "r")
+        inputfile = open(args.data_file, "r")
         inputlines = inputfile.readlines()
+        inputfile.close()
 
-        count = 0
-        data_table = []
-        line_counter = 0
-
-        for line in inputlines:
-            datatable = line.replace("\n","")    # filter out newlines
-            datatable2 = datatable.split(" ")    # split text data on space characters
-            datatable3 = []
-            for element in datatable2:
-                datatable5 = []
-                if element.find(':') > 0:       # further split on colon character
-                    datatable4 = (element.split(":"))
-                    datatable5.append(int(datatable4[0]))
-                    datatable5.append(float(datatable4[1]))
-                    datatable3.append(datatable5)
-                else:
-                    datatable3.append(int(element))
-            data_table.append(datatable3)
-            line_counter += 1
+        features, labels, attrib_list = parse_lines(inputlines)
 
 
     else:
@@ -330,144 +1398,86 @@ if __name__ == "__main__":
         # Read from stdin for autograder
         ######
 
-        data_table = []
         data_table_input = []
-        data_rows = 0
         for line in sys.stdin:
-            dataline = line.replace("\n", "")
-            datalinesplit = dataline.split(" ")
-            data_table_input.append(datalinesplit)
-            data_rows += 1
-
-        for row in data_table_input:
-            datatable3 = []
-            for element in row:
-                datatable5 = []
-                if element.find(':') > 0:
-                    datatable4 = (element.split(":"))
-                    datatable5.append(int(datatable4[0]))
-                    datatable5.append(float(datatable4[1]))
-                    datatable3.append(datatable5)
-                else:
-                    datatable3.append(int(element))
-
-            data_table.append(datatable3)
-
-
-
-    training_data = make_training_or_test_data(data_table, "training")
-    test_data = make_training_or_test_data(data_table, "test")
-
-########
-#   Set the first and second level of tree nodes to be decision type nodes (as opposed to leaf nodes)
-#   by default.  Will be changed to leaf nodes later if needed
-########
-
-    root_node = "Decision"
-    left_node = "Decision"
-    right_node = "Decision"
-
+            data_table_input.append(line)
 
-#########
-#   root node data processing
-#########
-    split_to_use = split_data(training_data)  # find the best split
-    root_attribute = split_to_use[0]
-    root_value = split_to_use[2]
+        features, labels, attrib_list = parse_lines(data_table_input)
 
-    left_right_data = split_data_to_right_left(split_to_use, training_data)   # split data into left and right parts
-    root_left_data = left_right_data[0]
-    root_right_data = left_right_data[1]
 
 
-#########
-# left node data processing
-#########
-    class_count_left = class_counter(root_left_data)
+    training_data = make_training_or_test_data(labels, "training")
+    test_data = make_training_or_test_data(labels, "test")
+    test_features = features.select_rows(test_data) if args.sparse else features[test_data]
+    if telemetry is not None:
+        telemetry("parse", {"rows": len(labels), "training_rows": len(training_data), "test_rows": len(test_data),
+                            "seconds": time.perf_counter() - phase_start})
 
-    if len(class_count_left) == 1:  # if only one class in the data, then this node becomes a leaf instead of decision node, and use that class for any data that takes this branch
-        left_node = "Leaf"
-        left_node_leaf_class = class_count_left[0][0]
+    phase_start = time.perf_counter()
 
-    else:
-        left_split_to_use = split_data(root_left_data)   # find best split for left data
-        left_attribute = left_split_to_use[0]
-        left_value = left_split_to_use[2]
-
-        left_left_right_data = split_data_to_right_left(left_split_to_use, root_left_data)
-        left_left_data = left_left_right_data[0]
-        left_right_data = left_left_right_data[1]
-
-        ll_class = maximum_count(class_counter(left_left_data))     # determine which classes to assign to the left branch below this node
-        lr_class = maximum_count(class_counter(left_right_data))     # determine which classes to assign to the right branch below this node
-
-    #########
-    # right node data processing
-    #########
-    class_count_right = class_counter(root_right_data)
-
-    if len(class_count_right) == 1:
-        right_node = "Leaf"
-        right_node_leaf_class = class_count_right[0][0]
+    if args.forest_trees > 0:
+        forest = RandomForest(args.forest_trees, None, args.max_depth, args.min_samples_split, args.min_info_gain, None,
+                              args.jobs)
+        forest.fit(features, labels, training_data, attrib_list)
+        if telemetry is not None:
+            telemetry("fit", {"trees": args.forest_trees, "seconds": time.perf_counter() - phase_start})
 
+        phase_start = time.perf_counter()
+        test_classes = forest.predict(test_features)
     else:
-        right_split_to_use = split_data(root_right_data)
-
-        right_attribute = right_split_to_use[0]
-        right_value = right_split_to_use[2]
-        right_left_right_data = split_data_to_right_left(right_split_to_use, root_right_data)
-        right_left_data = right_left_right_data[0]
-        right_right_data = right_left_right_data[1]
-
-        rl_class = maximum_count(class_counter(right_left_data))    # determine which classes to assign to the left branch below this node
-        rr_class = maximum_count(class_counter(right_right_data))    # determine which classes to assign to the right branch below this node
+        flat_tree = None
+
+        if args.model is not None:
+            training_hash = hash_training_data(features, labels, training_data,
+                                               (args.max_depth, args.min_samples_split, args.min_info_gain,
+                                                args.split_mode, args.max_bins, args.sparse, args.sparse_default))
+            if os.path.exists(args.model):
+                saved_tree, saved_hash = load_model(args.model)
+                if saved_hash == training_hash or len(training_data) == 0:   # no training rows at all: predict only
+                    flat_tree = saved_tree
+
+        if flat_tree is None:
+            if args.split_mode == "binned":
+                binned = BinnedFeatures(features, labels, training_data, attrib_list, args.max_bins)
+                root_node = build_tree_binned(binned, training_data, None, args.max_depth, args.min_samples_split,
+                                              args.min_info_gain, telemetry)
+            elif args.split_mode == "presorted":
+                presorted = PresortedFeatures(features, labels, training_data, attrib_list)
+                root_node = build_tree_presorted(presorted, presorted.sorted_rows, args.max_depth,
+                                                 args.min_samples_split, args.min_info_gain, telemetry)
+            elif args.jobs > 1:
+                with ParallelSplitter(features, labels, args.jobs) as splitter:
+                    root_node = build_tree(features, labels, training_data, attrib_list, args.max_depth,
+                                           args.min_samples_split, args.min_info_gain, splitter, telemetry)
+            else:
+                root_node = build_tree(features, labels, training_data, attrib_list, args.max_depth,
+                                       args.min_samples_split, args.min_info_gain, None, telemetry)
 
-    ######################
-    #  building/training of the decision tree is done, next we'll travere the tree and classify the test data
-    ######################
+            ######################
+            #  building/training of the decision tree is done, next we'll travere the tree and classify the test data
+            ######################
 
+            flat_tree = FlatTree(root_node)
+            if args.model is not None:
+                save_model(args.model, flat_tree, training_hash)
+        if telemetry is not None:    # a tree loaded from --model has no node events
+            telemetry("fit", {"nodes": len(flat_tree.attribute), "seconds": time.perf_counter() - phase_start})
 
-    ###############
-    #  traverse tree with test data
-    ###############
+        phase_start = time.perf_counter()
+        test_classes = flat_tree.predict(test_features)
 
-    next_step = "X"
+    if telemetry is not None:
+        telemetry("predict", {"rows": len(test_classes), "seconds": time.perf_counter() - phase_start})
 
-    testing_counter = 0   # keep track of which training elements we've done so far
+    phase_start = time.perf_counter()
+    sys.stdout.write(format_results(test_classes))
 
-    for item in test_data:
-        for i in range(1,len(item)):
-            if (item[i][0] == root_attribute):
-                if (item[i][1] <= root_value):
-                    next_step = "L"
-                else:
-                    next_step = "R"
+    if telemetry is not None:   # entropy evaluations of ParallelSplitter workers (--jobs > 1, one tree) are not counted
+        telemetry("write", {"rows": len(test_classes), "seconds": time.perf_counter() - phase_start})
+        telemetry("total", {"entropy_evaluations": entropy_counter["evaluations"],
+                            "candidate_splits": entropy_counter["candidate_splits"],
+                            "sorts": sort_counter["sorts"], "sorts_avoided": sort_counter["sorts_avoided"],
+                            "values_sort_avoided": sort_counter["values_sort_avoided"],
+                            "seconds": time.time() - start_time})
 
-        if next_step == "L":   # go down left branch
-            if left_node == "Leaf":
-                print("Testing point ", testing_counter, " belongs to class: ",left_node_leaf_class)
-                testing_counter += 1
-            else:
-                for j in range(1, len(item)):
-                    if (item[j][0] == left_attribute):
-                        if (item[j][1] <= left_value):    # choose whether to take left or right sub-branch
-                            print("Testing point ", testing_counter, " belongs to class: ", ll_class[0])
-                            testing_counter += 1
-                        else:
-                            print("Testing point ", testing_counter, " belongs to class: ", lr_class[0])
-                            testing_counter += 1
-        else:  # go down right branch
-            if right_node == "Leaf":
-                print("Testing point ", testing_counter, " belongs to class: ",right_node_leaf_class)
-                testing_counter += 1
-            else:
-                for j in range(1, len(item)):
-                    if (item[j][0] == right_attribute):
-                        if (item[j][1] <= right_value):    # choose whether to take left or right sub-branch
-                            print("Testing point ", testing_counter, " belongs to class: ", rl_class[0])
-                            testing_counter += 1
-                        else:
-                            print("Testing point ", testing_counter, " belongs to class: ", rr_class[0])
-                            testing_counter += 1
-
-exit(0)
\ No newline at end of file
+    exit(0)
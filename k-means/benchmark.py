@@ -0,0 +1,525 @@
+#####################
+#  Benchmark the k-means clustering code on places.txt scaled up synthetically, or on seeded Gaussian blobs (suite)
+#
+#  usage: python benchmark.py engine|init|bounds|load|parallel|write|index|minibatch [--sizes number of points ...]
+#         python benchmark.py suite [--sizes number of points ...] [--dims D] [--clusters K] [--no-memory]
+#                                   [--json results.json]
+#####################
+
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+#######################
+#   Load "k-means ext.py" as a module (the space in the file name keeps it from being imported normally)
+#
+#   outputs: kmeans_ext: the loaded module
+######################
+
+def load_kmeans_ext():
+    spec = importlib.util.spec_from_file_location("kmeans_ext", os.path.join(here, "k-means ext.py"))
+    kmeans_ext = importlib.util.module_from_spec(spec)
+    sys.modules["kmeans_ext"] = kmeans_ext     # worker processes look functions up by module name
+    spec.loader.exec_module(kmeans_ext)
+    return kmeans_ext
+
+
+#######################
+#   Make a larger data set by repeating places.txt and adding a little random noise to each copy
+#
+#   inputs: base_points: N x 2 array of points to scale up
+#           n_points: number of points wanted
+#           seed: random seed, so runs are repeatable
+#   outputs: points: n_points x 2 array of points
+######################
+
+def scale_points(base_points, n_points, seed=0):
+    rng = numpy.random.default_rng(seed)
+    reps = -(-n_points // len(base_points))
+    points = numpy.tile(base_points, (reps, 1))[:n_points]
+    return points + rng.normal(scale=0.01, size=points.shape)
+
+
+#######################
+#   The original pure Python assignment/update loop, kept here as the baseline to compare against.
+#   As written originally, k_new is never reset and k0, k1, k2 end up as the same lists as k_new: the second update
+#   adds the cluster sums onto the previous centroids, and since k0 then is k_new[0] its shift reads as 0, so the
+#   loop always stops after two updates.  The numpy engine iterates until the centroids settle instead, so the two
+#   only give the same labels when two updates happen to be enough (as for places.txt).  fixed=True resets k_new
+#   each pass, which gives the loop the numpy engine's behaviour.
+#
+#   inputs: data_table: list of [x, y] points
+#           fixed: reset the sums each pass instead of reproducing the original two-update stop
+#   outputs: k_list: list of [cluster, x, y] for each point
+######################
+
+def loop_kmeans(data_table, fixed=False):
+    x_min = min(pair[0] for pair in data_table)
+    x_max = max(pair[0] for pair in data_table)
+    y_min = min(pair[1] for pair in data_table)
+    y_max = max(pair[1] for pair in data_table)
+    y_avg = data_table[0][1]
+    for count, pair in enumerate(data_table[1:], 2):    # running average, as the original computes it
+        y_avg = (y_avg * (count - 1) + pair[1]) / count
+
+    k0 = [x_min, y_min]
+    k1 = [x_max, y_max]
+    k2 = [x_max, y_avg]
+
+    k_list = []
+    for pair in data_table:
+        dist_k0 = math.sqrt((pair[0] - k0[0]) ** 2 + (pair[1] - k0[1]) ** 2)
+        dist_k1 = math.sqrt((pair[0] - k1[0]) ** 2 + (pair[1] - k1[1]) ** 2)
+        dist_k2 = math.sqrt((pair[0] - k2[0]) ** 2 + (pair[1] - k2[1]) ** 2)
+        if(dist_k0<dist_k1 and dist_k0<dist_k2):
+            new_k = 0
+        elif(dist_k1<dist_k0 and dist_k1<dist_k2):
+            new_k = 1
+        else:
+            new_k = 2
+        k_list.append([new_k, pair[0], pair[1]])
+
+    k_new = [[0, 0], [0, 0], [0, 0]]
+    k_delta = 1
+    while (k_delta > .001):
+        if fixed:
+            k_new = [[0, 0], [0, 0], [0, 0]]
+        k_counter = [0, 0, 0]
+        for coords in k_list:
+            k_counter[coords[0]] += 1
+            k_new[coords[0]][0] += coords[1]
+            k_new[coords[0]][1] += coords[2]
+        for i in range(3):
+            k_new[i][0] = k_new[i][0] / k_counter[i]
+            k_new[i][1] = k_new[i][1] / k_counter[i]
+
+        k_delta = 0
+        for old_k, new_k in zip((k0, k1, k2), k_new):
+            k_delta += math.sqrt((old_k[0] - new_k[0]) ** 2 + (old_k[1] - new_k[1]) ** 2)
+        k0, k1, k2 = k_new    # the same lists as k_new, not copies
+
+        for coords in k_list:
+            dist_k0 = math.sqrt((coords[1] - k0[0]) ** 2 + (coords[2] - k0[1]) ** 2)
+            dist_k1 = math.sqrt((coords[1] - k1[0]) ** 2 + (coords[2] - k1[1]) ** 2)
+            dist_k2 = math.sqrt((coords[1] - k2[0]) ** 2 + (coords[2] - k2[1]) ** 2)
+            if (dist_k0 < dist_k1 and dist_k0 < dist_k2):
+                coords[0] = 0
+            elif (dist_k1 < dist_k0 and dist_k1 < dist_k2):
+                coords[0] = 1
+            else:
+                coords[0] = 2
+    return k_list
+
+
+#######################
+#   The original line by line text parser, kept here as the baseline for the load benchmark
+#
+#   inputs: input_file_name: comma separated file with one point per line
+#   outputs: data_table_input: list of [x, y] points
+######################
+
+def loop_read(input_file_name):
+    inputfile = open(input_file_name, "r")
+    inputlines = inputfile.readlines()
+    data_table_input = []
+    for line in inputlines:
+        datatable = line.replace("\n", "")
+        datatable2 = datatable.split(",")
+        datatable2 = list(map(float, datatable2))
+        data_table_input.append(datatable2)
+    inputfile.close()
+    return data_table_input
+
+
+#######################
+#   Seeded Gaussian blobs: n_clusters random centers in a box, and points spread normally around them
+#
+#   inputs: n_points: number of points wanted
+#           n_dims: number of dimensions (D)
+#           n_clusters: number of blobs
+#           seed: random seed, so runs are repeatable
+#   outputs: points: n_points x n_dims array of points
+#            blob_labels: the blob each point was drawn from
+######################
+
+def make_blobs(n_points, n_dims=2, n_clusters=8, seed=0):
+    rng = numpy.random.default_rng(seed)
+    centers = rng.uniform(-10.0, 10.0, size=(n_clusters, n_dims))
+    blob_labels = rng.integers(n_clusters, size=n_points)
+    points = rng.normal(size=(n_points, n_dims))
+    points += centers[blob_labels]
+    return points, blob_labels
+
+
+#######################
+#   Write points as a comma separated file in the format of places.txt, a chunk at a time
+#
+#   inputs: file_name: file to write
+#           points: N x D array of points
+#           chunk_size: points per write
+######################
+
+def write_points_file(file_name, points, chunk_size=65536):
+    with open(file_name, "w") as outputfile:
+        for start in range(0, len(points), chunk_size):
+            numpy.savetxt(outputfile, points[start:start + chunk_size], delimiter=",", fmt="%.7f")
+
+
+#######################
+#   Run one phase of a benchmark, timing it, then run it again under tracemalloc for its peak memory (numpy arrays
+#   included).  Tracing slows Python code down several times, so the timed run is kept separate from it.
+#
+#   inputs: phase_function: function to run
+#           args: arguments for phase_function
+#           track_memory: False to skip the traced run
+#   outputs: result: what phase_function returned
+#            seconds: wall time of the phase
+#            peak_mb: most memory allocated during the phase in MB (None if not tracked)
+######################
+
+def measure_phase(phase_function, *args, track_memory=True):
+    start_time = time.perf_counter()
+    result = phase_function(*args)
+    seconds = time.perf_counter() - start_time
+
+    peak_mb = None
+    if track_memory:
+        tracemalloc.start()
+        phase_function(*args)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+    return result, seconds, peak_mb
+
+
+#######################
+#   Describe the code and machine a set of results came from, so results from different versions can be compared
+#
+#   outputs: dictionary of the git commit, python and numpy versions, platform and core count
+######################
+
+def run_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "numpy": numpy.__version__,
+            "platform": platform.platform(), "cores": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+#######################
+#   Compare the original pure Python loop against the numpy engine.  "differ from original" counts the labels that
+#   differ from the loop exactly as it was written, which stops after two updates; "same as fixed" compares them with
+#   the loop run to convergence, as the numpy engine runs (see loop_kmeans).  Scaled places.txt settles within two
+#   updates, so blobs from a few seeds are there to show where the original loop stops early.  The loop is timed
+#   in its fixed form, so both sides run the same iterations.
+######################
+
+def bench_engine(kmeans_ext, base_points, sizes=(10 ** 4, 10 ** 5), blob_seeds=(0, 1, 2, 3)):
+    print("points      data       loop (s)   numpy (s)   speedup   iterations   differ from original   same as fixed")
+    for n_points in sizes:
+        data_sets = [("places", scale_points(base_points, n_points))]
+        for seed in blob_seeds:
+            data_sets.append((f"blobs {seed}", make_blobs(n_points, 2, 8, seed)[0]))
+
+        for data_name, points in data_sets:
+            k_list = loop_kmeans(points.tolist())
+            start_time = time.perf_counter()
+            fixed_list = loop_kmeans(points.tolist(), fixed=True)
+            loop_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            model = kmeans_ext.KMeans(n_clusters=3).fit(points)
+            numpy_time = time.perf_counter() - start_time
+
+            n_differ = sum(coords[0] != label for coords, label in zip(k_list, model.labels_))
+            same_fixed = all(coords[0] == label for coords, label in zip(fixed_list, model.labels_))
+            print(f"{n_points:<11d} {data_name:<10s} {loop_time:<10.3f} {numpy_time:<11.4f} "
+                  f"{loop_time / numpy_time:<9.1f} {model.n_iter_:<12d} {n_differ:<22d} {same_fixed}")
+
+
+#######################
+#   Iterations to converge and fit time for each initialization method, averaged over a few seeds
+######################
+
+def bench_init(kmeans_ext, base_points, sizes=(10 ** 4, 10 ** 5), n_clusters_list=(3, 10, 30), n_seeds=5):
+    print("points      K     init         iterations   reseeded   fit (s)")
+    for n_points in sizes:
+        points = scale_points(base_points, n_points)
+        for n_clusters in n_clusters_list:
+            for init in kmeans_ext.init_methods:
+                n_iters = []
+                n_reseeded = []
+                fit_times = []
+                for seed in range(n_seeds):
+                    start_time = time.perf_counter()
+                    model = kmeans_ext.KMeans(n_clusters=n_clusters, init=init, random_state=seed).fit(points)
+                    fit_times.append(time.perf_counter() - start_time)
+                    n_iters.append(model.n_iter_)
+                    n_reseeded.append(model.n_reseeded_)
+                print(f"{n_points:<11d} {n_clusters:<5d} {init:<12s} {numpy.mean(n_iters):<12.1f} "
+                      f"{numpy.mean(n_reseeded):<10.1f} {numpy.mean(fit_times):.4f}")
+
+
+#######################
+#   Lloyd vs Hamerly vs incremental: fit time and share of distance computations each one lets us skip
+######################
+
+def bench_bounds(kmeans_ext, base_points, sizes=(10 ** 4, 10 ** 5), n_clusters_list=(3, 10, 50)):
+    print("points      K     algorithm   iterations   skipped   fit (s)")
+    for n_points in sizes:
+        points = scale_points(base_points, n_points)
+        for n_clusters in n_clusters_list:
+            for algorithm in ("lloyd", "hamerly", "incremental"):
+                start_time = time.perf_counter()
+                model = kmeans_ext.KMeans(n_clusters=n_clusters, init="k-means++", random_state=0,
+                                          algorithm=algorithm).fit(points)
+                fit_time = time.perf_counter() - start_time
+                skipped = sum(model.n_skipped_) / max(1, n_points * n_clusters * model.n_iter_)
+                print(f"{n_points:<11d} {n_clusters:<5d} {algorithm:<11s} {model.n_iter_:<12d} "
+                      f"{skipped:<9.1%} {fit_time:.4f}")
+
+
+#######################
+#   Load time of the original line parser, the bulk text loader, and a memory-mapped .npy file
+######################
+
+def bench_load(kmeans_ext, base_points, sizes=(10 ** 6, 10 ** 7)):
+    print("points      line parse (s)   bulk text (s)   convert (s)   npy mmap (s)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        csv_file = os.path.join(tmpdir, "points.txt")
+        npy_file = os.path.join(tmpdir, "points.npy")
+        for n_points in sizes:
+            numpy.savetxt(csv_file, scale_points(base_points, n_points), delimiter=",", fmt="%.7f")
+
+            start_time = time.perf_counter()
+            numpy.array(loop_read(csv_file))
+            loop_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            kmeans_ext.read_data_file(csv_file)
+            bulk_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            kmeans_ext.convert_to_npy(csv_file, npy_file)
+            convert_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            points, count = kmeans_ext.read_data_file(npy_file)
+            points.sum()    # touch every page so the mapped file is really read
+            npy_time = time.perf_counter() - start_time
+            del points
+
+            print(f"{n_points:<11d} {loop_time:<16.3f} {bulk_time:<15.3f} {convert_time:<13.3f} {npy_time:.4f}")
+
+
+#######################
+#   Scaling of the parallel assignment step with the number of worker processes (fixed number of iterations)
+######################
+
+def bench_parallel(kmeans_ext, base_points, sizes=(10 ** 6,), n_clusters=10, n_jobs_list=(1, 2, 4, 8)):
+    print(f"cores available: {os.cpu_count()}")
+    print("points      K     workers   fit (s)   speedup")
+    for n_points in sizes:
+        points = scale_points(base_points, n_points)
+        base_time = None
+        for n_jobs in n_jobs_list:
+            start_time = time.perf_counter()
+            kmeans_ext.KMeans(n_clusters=n_clusters, init="k-means++", random_state=0, max_iter=20, tol=0,
+                              n_jobs=n_jobs).fit(points)
+            fit_time = time.perf_counter() - start_time
+            base_time = base_time or fit_time
+            print(f"{n_points:<11d} {n_clusters:<5d} {n_jobs:<9d} {fit_time:<9.3f} {base_time / fit_time:.2f}")
+
+
+#######################
+#   Write time of the original print per point against the bulk writer in each output format
+######################
+
+def bench_write(kmeans_ext, base_points, sizes=(10 ** 6,)):
+    print("points      format   write (s)   size (MB)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        output_file = os.path.join(tmpdir, "clusters.out")
+        for n_points in sizes:
+            points = scale_points(base_points, n_points)
+            labels = numpy.random.default_rng(0).integers(3, size=n_points)
+
+            start_time = time.perf_counter()
+            outputfile = open(output_file, "w")
+            counter = 0
+            for label in labels:
+                print("Point number", counter, "belongs to cluster #", label, sep = ' ', file = outputfile)
+                counter += 1
+            outputfile.close()
+            write_time = time.perf_counter() - start_time
+            print(f"{n_points:<11d} {'print':<8s} {write_time:<11.3f} {os.path.getsize(output_file) / 1e6:.1f}")
+
+            for output_format in kmeans_ext.output_formats:
+                start_time = time.perf_counter()
+                with kmeans_ext.ClusterWriter(output_file, output_format) as writer:
+                    writer.write(labels, points)
+                write_time = time.perf_counter() - start_time
+                print(f"{n_points:<11d} {output_format:<8s} {write_time:<11.3f} "
+                      f"{os.path.getsize(output_file) / 1e6:.1f}")
+
+
+#######################
+#   One nearest-centroid pass by brute force against a KD-tree over the centroids (tree build included),
+#   for growing K, to find the K where the index starts to win
+######################
+
+def bench_index(kmeans_ext, base_points, sizes=(10 ** 5,), n_clusters_list=(2, 4, 8, 16, 32, 64, 128, 256, 512)):
+    print("points      K     brute (s)   kdtree (s)   speedup")
+    for n_points in sizes:
+        points = scale_points(base_points, n_points)
+        rng = numpy.random.default_rng(0)
+        crossover = None
+        for n_clusters in n_clusters_list:
+            centroids = points[rng.choice(n_points, n_clusters, replace=False)]
+
+            start_time = time.perf_counter()
+            brute_labels = kmeans_ext.assign_points(points, centroids)
+            brute_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            tree_labels = kmeans_ext.assign_points_kdtree(points, centroids)
+            tree_time = time.perf_counter() - start_time
+
+            if crossover is None and tree_time < brute_time:
+                crossover = n_clusters
+            print(f"{n_points:<11d} {n_clusters:<5d} {brute_time:<11.4f} {tree_time:<12.4f} {brute_time / tree_time:.2f}")
+        print(f"kdtree faster from K = {crossover} for {n_points} points")
+
+
+#######################
+#   Full k-means against mini-batch k-means fitted on the same array (split into batches by fit) and on the same
+#   points streamed from a file with read_data_chunks: fit time, inertia, and whether both mini-batch fits agree
+######################
+
+def bench_minibatch(kmeans_ext, base_points, sizes=(10 ** 5, 10 ** 6), n_clusters=8, batch_size=65536):
+    print("points      full (s)   minibatch (s)   full inertia     minibatch inertia   array = chunks")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_file = os.path.join(tmpdir, "points.txt")
+        for n_points in sizes:
+            points, blob_labels = make_blobs(n_points, 2, n_clusters)
+            write_points_file(input_file, points)
+            points = kmeans_ext.read_data_file(input_file)[0]    # the same rounded values the chunks will have
+
+            start_time = time.perf_counter()
+            full = kmeans_ext.KMeans(n_clusters=n_clusters, init="k-means++", random_state=0).fit(points)
+            full_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            array_model = kmeans_ext.MiniBatchKMeans(n_clusters, random_state=0, batch_size=batch_size).fit(points)
+            minibatch_time = time.perf_counter() - start_time
+
+            chunk_model = kmeans_ext.MiniBatchKMeans(n_clusters, random_state=0, batch_size=batch_size)
+            chunk_model.fit(kmeans_ext.read_data_chunks(input_file, batch_size))
+            same = numpy.array_equal(array_model.cluster_centers_, chunk_model.cluster_centers_)
+
+            minibatch_inertia = kmeans_ext.calc_inertia(points, array_model.predict(points), array_model.cluster_centers_)
+            print(f"{n_points:<11d} {full_time:<10.3f} {minibatch_time:<15.3f} {full.inertia_:<16.1f} "
+                  f"{minibatch_inertia:<19.1f} {same}")
+
+
+#######################
+#   Write the cluster of each point in the original text format and close the file, so the write is complete
+######################
+
+def write_clusters(kmeans_ext, output_file, labels):
+    with kmeans_ext.ClusterWriter(output_file, "text") as writer:
+        writer.write(labels)
+
+
+#######################
+#   Timing and peak memory of each phase (load, fit, predict, write) on seeded Gaussian blobs, for comparing
+#   versions.  The blobs are written to a text file first, so load includes the text parsing.
+#   Returns one result record per size, which --json saves.
+######################
+
+def bench_suite(kmeans_ext, base_points, sizes=(10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6), n_dims=2, n_clusters=8,
+                seed=0, track_memory=True):
+    records = []
+    print("points      D     K     load (s)   fit (s)    predict (s)   write (s)   iterations   peak (MB)")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        input_file = os.path.join(tmpdir, "points.txt")
+        output_file = os.path.join(tmpdir, "clusters.txt")
+        for n_points in sizes:
+            points, blob_labels = make_blobs(n_points, n_dims, n_clusters, seed)
+            write_points_file(input_file, points)
+            del points, blob_labels
+
+            seconds = {}
+            peak_mb = {}
+            (points, count), seconds["load"], peak_mb["load"] = measure_phase(
+                kmeans_ext.read_data_file, input_file, track_memory=track_memory)
+            model = kmeans_ext.KMeans(n_clusters=n_clusters, init="k-means++", random_state=seed)
+            model, seconds["fit"], peak_mb["fit"] = measure_phase(model.fit, points, track_memory=track_memory)
+            labels, seconds["predict"], peak_mb["predict"] = measure_phase(model.predict, points,
+                                                                           track_memory=track_memory)
+            result, seconds["write"], peak_mb["write"] = measure_phase(write_clusters, kmeans_ext, output_file, labels,
+                                                                       track_memory=track_memory)
+
+            records.append({"algorithm": "k-means", "points": n_points, "dims": n_dims, "clusters": n_clusters,
+                            "seed": seed, "seconds": seconds, "peak_mb": peak_mb,
+                            "iterations": int(model.n_iter_), "inertia": float(model.inertia_)})
+            peak_text = f"{max(peak_mb.values()):.1f}" if track_memory else "-"
+            print(f"{n_points:<11d} {n_dims:<5d} {n_clusters:<5d} {seconds['load']:<10.3f} {seconds['fit']:<10.3f} "
+                  f"{seconds['predict']:<13.3f} {seconds['write']:<11.3f} {model.n_iter_:<12d} {peak_text}")
+    return records
+
+
+benchmarks = {
+    "engine": bench_engine,
+    "init": bench_init,
+    "bounds": bench_bounds,
+    "load": bench_load,
+    "parallel": bench_parallel,
+    "write": bench_write,
+    "index": bench_index,
+    "minibatch": bench_minibatch,
+    "suite": bench_suite,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="k-means benchmarks")
+    parser.add_argument("benchmark", choices=sorted(benchmarks))
+    parser.add_argument("--sizes", type=int, nargs="+", help="numbers of points to test (each benchmark has a default)")
+    parser.add_argument("--dims", type=int, default=2, help="dimensions of the generated points (suite)")
+    parser.add_argument("--clusters", type=int, default=8, help="number of blobs and clusters (suite)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the second, traced run of each phase that measures peak memory (suite)")
+    parser.add_argument("--json", help="also save the results to this JSON file (suite)")
+    args = parser.parse_args()
+
+    kmeans_ext = load_kmeans_ext()
+    base_points, count = kmeans_ext.read_data_file(os.path.join(here, "places.txt"))
+
+    bench_args = {}
+    if args.sizes:
+        bench_args["sizes"] = args.sizes
+    if args.benchmark == "suite":
+        bench_args["n_dims"] = args.dims
+        bench_args["n_clusters"] = args.clusters
+        bench_args["track_memory"] = not args.no_memory
+    records = benchmarks[args.benchmark](kmeans_ext, base_points, **bench_args)
+
+    if args.json and records is not None:
+        with open(args.json, "w") as outputfile:
+            json.dump({"run": run_info(), "results": records}, outputfile, indent=2)
@@ -1,153 +1,1150 @@
 #####################
-#  Use the k-means clustering algorithm to decide which of 3 clusters given data belongs in
+#  Use the k-means clustering algorithm to decide which of K clusters given data belongs in
+#  (3 clusters of 2-D points from places.txt when run as a script)
 #
 #####################
 
 
-import pandas
+import argparse
+import itertools
+import json
+import multiprocessing
+from multiprocessing import shared_memory
 import numpy
-from array import *
-from itertools import permutations
+import sys
 import time
-import math
+
+try:
+    from scipy.spatial import cKDTree    # optional, only needed for the "kdtree" algorithm
+except ImportError:
+    cKDTree = None
+
+#######################
+#   Read the data file a chunk of lines at a time, so memory use stays at one chunk no matter how big the file is.
+#   Each chunk of text lines is parsed in bulk by numpy.loadtxt instead of splitting and converting line by line.
+#   A .npy file (see convert_to_npy) is memory-mapped and sliced instead, skipping text parsing entirely.
+#
+#   inputs: input_file_name: comma separated file with one point per line, or a .npy file of points
+#           chunk_size: number of points per chunk
+#   outputs: yields chunk_size x D arrays of points (the last one may be shorter)
+######################
+
+def read_data_chunks(input_file_name, chunk_size=65536):
+
+    if input_file_name.endswith(".npy"):
+        points = numpy.load(input_file_name, mmap_mode="r")
+        for start in range(0, len(points), chunk_size):
+            yield numpy.array(points[start:start + chunk_size], dtype=numpy.float64)
+        return
+
+    with open(input_file_name, "r") as inputfile:
+        while True:
+            lines = list(itertools.islice(inputfile, chunk_size))
+            if len(lines) == 0:
+                break
+            yield numpy.loadtxt(lines, delimiter=",", dtype=numpy.float64, ndmin=2)
+
+
+
+
+#######################
+#   Read the whole data file into one array.  A .npy file is memory-mapped rather than read, so only the pages
+#   that are actually used get loaded.
+#
+#   inputs: input_file_name: comma separated file with one point per line, or a .npy file of points
+#   outputs: points: N x D array of points
+#            count: number of points read
+######################
 
 def read_data_file(input_file_name):
 
-    inputfile = open(input_file_name, "r")
-    inputlines = inputfile.readlines()
+    if input_file_name.endswith(".npy"):
+        points = numpy.load(input_file_name, mmap_mode="r")
+    else:
+        points = numpy.loadtxt(input_file_name, delimiter=",", dtype=numpy.float64, ndmin=2)
+
+    return points, len(points)
+
+
 
-    ##############
-    # parse through data lines, splitting into lists for each line
-    ##############
 
-    # initialize data_table list
+#######################
+#   Convert a comma separated points file to a .npy file of float64 points, a chunk at a time.
+#   The rows are counted first so the output can be written straight into a memory-mapped file; they are counted
+#   the way numpy.loadtxt reads them, skipping blank lines and # comments.
+#
+#   inputs: input_file_name: comma separated file with one point per line
+#           output_file_name: .npy file to write
+#           chunk_size: number of points to parse at a time
+#   outputs: count: number of points written
+######################
 
-    data_table_input = []
+def convert_to_npy(input_file_name, output_file_name, chunk_size=65536):
 
-    # initialize counter variables
     count = 0
+    with open(input_file_name, "r") as inputfile:
+        for line in inputfile:
+            data = line.split("#", 1)[0]
+            if data.strip() != "":
+                if count == 0:
+                    n_dims = len(data.split(","))
+                count += 1
+    if count == 0:
+        raise ValueError("no points in " + input_file_name)
+
+    points = numpy.lib.format.open_memmap(output_file_name, mode="w+", dtype=numpy.float64, shape=(count, n_dims))
+
+    start = 0
+    for data_chunk in read_data_chunks(input_file_name, chunk_size):
+        points[start:start + len(data_chunk)] = data_chunk
+        start += len(data_chunk)
+    points.flush()
+
+    return count
+
+
+
+
+#######################
+#   Number of points to compare against all the centroids at a time, so the chunk x K x D difference array
+#   built by the distance functions stays within chunk_bytes however many centroids and dimensions there are
+#
+#   inputs: centroids: K x D array of centroids
+#           chunk_bytes: memory budget for the difference array
+#   outputs: chunk_size: number of points per chunk (at least 1)
+######################
+
+distance_chunk_bytes = 32 * 1024 * 1024
+
+def distance_chunk_size(centroids, chunk_bytes=distance_chunk_bytes):
+    return max(1, chunk_bytes // max(1, centroids.size * 8))
+
+
+
+
+#######################
+#   Find the nearest centroid of every point, using squared Euclidean distances computed by broadcasting
+#   the points against all centroids at once (sqrt is not needed to find the nearest one)
+#
+#   inputs: points: N x D array of points
+#           centroids: K x D array of centroids
+#           chunk_size: number of points to compare against the centroids at a time, by default sized from
+#                       distance_chunk_bytes
+#   outputs: labels: array of N cluster numbers, one per point
+#            min_sq_dist: squared distance from each point to its nearest centroid
+######################
+
+def nearest_centroids(points, centroids, chunk_size=None):
+    if chunk_size is None:
+        chunk_size = distance_chunk_size(centroids)
+    labels = numpy.empty(len(points), dtype=numpy.intp)
+    min_sq_dist = numpy.empty(len(points), dtype=numpy.float64)
+    for start in range(0, len(points), chunk_size):   # work in chunks so the chunk x K x D temporary stays bounded
+        block = points[start:start + chunk_size]
+        diff = block[:, numpy.newaxis, :] - centroids[numpy.newaxis, :, :]
+        sq_dist = numpy.einsum("nkd,nkd->nk", diff, diff)
+        block_labels = numpy.argmin(sq_dist, axis=1)
+        labels[start:start + chunk_size] = block_labels
+        min_sq_dist[start:start + chunk_size] = sq_dist[numpy.arange(len(block)), block_labels]
+    return labels, min_sq_dist
+
+
+
+
+#######################
+#   Assign every point to its nearest centroid
+#
+#   inputs: points: N x D array of points
+#           centroids: K x D array of centroids
+#   outputs: labels: array of N cluster numbers, one per point
+######################
+
+def assign_points(points, centroids):
+    labels, min_sq_dist = nearest_centroids(points, centroids)
+    return labels
+
+
+
+
+#######################
+#   Build a KD-tree over the centroids, so each point's nearest centroid can be found in about log(K) steps
+#   instead of comparing it to all K centroids.  Needs scipy.
+#
+#   inputs: centroids: K x D array of centroids
+#   outputs: index: KD-tree of the centroids
+######################
+
+def build_centroid_index(centroids):
+    if cKDTree is None:
+        raise ImportError("the kdtree algorithm needs scipy (scipy.spatial.cKDTree)")
+    return cKDTree(centroids)
+
+
+
+
+#######################
+#   Assign every point to its nearest centroid with a KD-tree query
+#
+#   inputs: points: N x D array of points
+#           centroids: K x D array of centroids
+#           index: KD-tree of the centroids, built here if not given
+#   outputs: labels: array of N cluster numbers, one per point
+######################
+
+def assign_points_kdtree(points, centroids, index=None):
+    if index is None:
+        index = build_centroid_index(centroids)
+    dist, labels = index.query(points, k=1)
+    return labels.astype(numpy.intp, copy=False)
+
+
+
+
+#######################
+#   Count the points in each cluster and add up their coordinates
+#
+#   inputs: points: N x D array of points
+#           labels: array of N cluster numbers, one per point
+#           n_clusters: number of clusters
+#   outputs: k_counter: number of points in each cluster
+#            k_sums: K x D array of the coordinate sums of each cluster
+######################
+
+def cluster_sums(points, labels, n_clusters):
+    k_counter = numpy.bincount(labels, minlength=n_clusters)
+    k_sums = numpy.empty((n_clusters, points.shape[1]), dtype=numpy.float64)
+    for d in range(points.shape[1]):    # per-coordinate sums, weighted bincount is much faster than numpy.add.at
+        k_sums[:, d] = numpy.bincount(labels, weights=points[:, d], minlength=n_clusters)
+    return k_counter, k_sums
+
+
+
+
+#######################
+#   Recalculate each centroid as the mean of the points currently assigned to it, from the cluster sums.
+#   A centroid with no points assigned stays where it was.
+#
+#   inputs: k_counter: number of points in each cluster
+#           k_sums: K x D array of the coordinate sums of each cluster
+#           old_centroids: K x D array of the current centroids
+#   outputs: centroids: K x D array of new centroids
+######################
+
+def update_centroids(k_counter, k_sums, old_centroids):
+    centroids = old_centroids.copy()
+    filled = k_counter > 0
+    centroids[filled] = k_sums[filled] / k_counter[filled, numpy.newaxis]
+    return centroids
+
+
+
+
+#######################
+#   Inertia (the k-means objective): sum of squared distances from every point to its own centroid
+#
+#   inputs: points: N x D array of points
+#           labels: array of N cluster numbers, one per point
+#           centroids: K x D array of centroids
+#           chunk_size: number of points to work on at a time
+#   outputs: inertia: the sum of squared distances
+######################
+
+def calc_inertia(points, labels, centroids, chunk_size=65536):
+    inertia = 0.0
+    for start in range(0, len(points), chunk_size):
+        diff = points[start:start + chunk_size] - centroids[labels[start:start + chunk_size]]
+        inertia += numpy.einsum("nd,nd->", diff, diff)
+    return float(inertia)
+
+
+
+
+#######################
+#   Worker side of ParallelAssigner: attach to the shared point and label arrays once when the worker starts,
+#   then assign one shard of points per task and send back only that shard's cluster counts and sums
+######################
+
+shared_arrays = {}
+
+def attach_shared_arrays(points_name, labels_name, shape):
+    points_shm = shared_memory.SharedMemory(name=points_name)
+    labels_shm = shared_memory.SharedMemory(name=labels_name)
+    shared_arrays["shm"] = (points_shm, labels_shm)    # keep the blocks open while the arrays are in use
+    shared_arrays["points"] = numpy.ndarray(shape, dtype=numpy.float64, buffer=points_shm.buf)
+    shared_arrays["labels"] = numpy.ndarray(shape[0], dtype=numpy.intp, buffer=labels_shm.buf)
+
+
+def assign_shard(start, stop, centroids):
+    points = shared_arrays["points"][start:stop]
+    labels = assign_points(points, centroids)
+    shared_arrays["labels"][start:stop] = labels
+    return cluster_sums(points, labels, len(centroids))
+
+
+
+
+#######################
+#   Run the assignment step on several cores.  The points are copied once into shared memory and split into
+#   one shard per worker; each iteration only the centroids go out to the workers, and only the per-shard
+#   cluster counts and sums come back to be added up here.  Labels are written straight into shared memory.
+#
+#   inputs: points: N x D array of points
+#           n_jobs: number of worker processes
+#   use as: with ParallelAssigner(points, n_jobs) as assigner:
+#               labels, k_counter, k_sums = assigner.assign(centroids)
+######################
+
+class ParallelAssigner:
+
+    def __init__(self, points, n_jobs):
+        self.points_shm = shared_memory.SharedMemory(create=True, size=max(1, points.nbytes))
+        self.labels_shm = shared_memory.SharedMemory(create=True, size=max(1, len(points) * numpy.dtype(numpy.intp).itemsize))
+        self.points = numpy.ndarray(points.shape, dtype=numpy.float64, buffer=self.points_shm.buf)
+        self.points[:] = points
+        self.labels = numpy.ndarray(len(points), dtype=numpy.intp, buffer=self.labels_shm.buf)
+
+        bounds = numpy.linspace(0, len(points), n_jobs + 1).astype(int)
+        self.shards = list(zip(bounds[:-1], bounds[1:]))
+        self.pool = multiprocessing.Pool(n_jobs, initializer=attach_shared_arrays,
+                                         initargs=(self.points_shm.name, self.labels_shm.name, points.shape))
+
+    def assign(self, centroids):
+        results = self.pool.starmap(assign_shard, [(start, stop, centroids) for start, stop in self.shards])
+        k_counter = sum(result[0] for result in results)
+        k_sums = sum(result[1] for result in results)
+        return self.labels, k_counter, k_sums
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        del self.points, self.labels    # release the buffers before closing the shared blocks
+        self.points_shm.close()
+        self.points_shm.unlink()
+        self.labels_shm.close()
+        self.labels_shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+
+
+#######################
+#   If any cluster ended up with no points, move its centroid onto the points that are farthest from their
+#   own centroid, so every cluster has a point to grow from on the next assignment
+#
+#   inputs: points: N x D array of points
+#           labels: array of N cluster numbers, one per point
+#           centroids: K x D array of centroids
+#           k_counter: number of points in each cluster
+#   outputs: centroids: K x D array of centroids with the empty ones moved
+#            n_empty: number of empty clusters that were moved
+######################
+
+def reseed_empty_clusters(points, labels, centroids, k_counter):
+    empty = numpy.flatnonzero(k_counter == 0)
+    if len(empty) == 0:
+        return centroids, 0
+
+    sq_dist = ((points - centroids[labels]) ** 2).sum(axis=1)
+    farthest = numpy.argpartition(sq_dist, -len(empty))[-len(empty):]
+
+    centroids = centroids.copy()
+    centroids[empty] = points[farthest]
+    return centroids, len(empty)
+
+
+
+
+#######################
+#   Find the nearest and second nearest centroid of every point, used to set up the Hamerly and incremental
+#   distance bounds
+#
+#   inputs: points: N x D array of points
+#           centroids: K x D array of centroids
+#           chunk_size: number of points to compare against the centroids at a time, by default sized from
+#                       distance_chunk_bytes
+#           squared: return squared distances instead (the nearest centroids are picked the same way either way)
+#   outputs: labels: array of N cluster numbers, one per point
+#            upper: distance from each point to its nearest centroid
+#            lower: distance from each point to its second nearest centroid
+######################
+
+def nearest_two_centroids(points, centroids, chunk_size=None, squared=False):
+    if chunk_size is None:
+        chunk_size = distance_chunk_size(centroids)
+    labels = numpy.empty(len(points), dtype=numpy.intp)
+    upper = numpy.empty(len(points), dtype=numpy.float64)
+    lower = numpy.full(len(points), numpy.inf)
+    for start in range(0, len(points), chunk_size):
+        block = points[start:start + chunk_size]
+        diff = block[:, numpy.newaxis, :] - centroids[numpy.newaxis, :, :]
+        sq_dist = numpy.einsum("nkd,nkd->nk", diff, diff)
+        block_labels = numpy.argmin(sq_dist, axis=1)
+        rows = numpy.arange(len(block))
+        labels[start:start + chunk_size] = block_labels
+        upper[start:start + chunk_size] = sq_dist[rows, block_labels]
+        if len(centroids) > 1:
+            sq_dist[rows, block_labels] = numpy.inf
+            lower[start:start + chunk_size] = sq_dist.min(axis=1)
+    if not squared:    # sqrt only the two distances kept, not all K
+        numpy.sqrt(upper, out=upper)
+        numpy.sqrt(lower, out=lower)
+    return labels, upper, lower
+
+
+
+
+#######################
+#   Hamerly's triangle-inequality assignment step.  Each point keeps an upper bound on the distance to its own
+#   centroid and a lower bound on the distance to every other centroid.  After the centroids move, the bounds are
+#   loosened by how far the centroids moved; a point whose upper bound is still below both its lower bound and half
+#   the distance from its centroid to the nearest other centroid cannot change cluster, so it is skipped.
+#   Remaining points first get their upper bound tightened (1 distance), and only the points still in doubt
+#   are compared against all K centroids.
+#
+#   inputs: points: N x D array of points
+#           centroids: K x D array of the new centroids
+#           shifts: how far each centroid moved in the last update
+#           labels, upper, lower: current cluster numbers and bounds, updated in place
+#   outputs: n_evals: number of point-to-centroid distances computed
+######################
+
+def hamerly_assign(points, centroids, shifts, labels, upper, lower):
+    n_clusters = len(centroids)
+
+    #### loosen the bounds by how far the centroids moved
+    upper += shifts[labels]
+    if n_clusters > 1:
+        top_two = numpy.argsort(shifts)[-2:]
+        max_other_shift = numpy.full(n_clusters, shifts[top_two[1]])
+        max_other_shift[top_two[1]] = shifts[top_two[0]]    # the largest shift of any other centroid
+        lower -= max_other_shift[labels]
+
+    #### half the distance from each centroid to its nearest other centroid
+    diff = centroids[:, numpy.newaxis, :] - centroids[numpy.newaxis, :, :]
+    centroid_dist = numpy.sqrt(numpy.einsum("ijd,ijd->ij", diff, diff))
+    numpy.fill_diagonal(centroid_dist, numpy.inf)
+    half_nearest = centroid_dist.min(axis=1) / 2
+
+    bound = numpy.maximum(half_nearest[labels], lower)
+    check = numpy.flatnonzero(upper > bound)
 
-    for line in inputlines:
-        datatable = line.replace("\n", "")  # filter out newlines
-        datatable2 = datatable.split(",")  # split data on commas
-        datatable2 = list(map(float, datatable2))  # convert to float, make list
-        data_table_input.append(datatable2)
-        count += 1
-
-    return data_table_input, count
-# open data file for reading
-
-data_file = "places.txt"
-
-data_table, count = read_data_file(data_file)
-
-##### set initial values to first items in data_table
-x_min = data_table[0][0]
-x_max = data_table[0][0]
-y_min = data_table[0][1]
-y_max = data_table[0][1]
-x_avg = data_table[0][0]
-y_avg = data_table[0][1]
+    #### tighten the upper bound of the points in doubt
+    upper[check] = numpy.sqrt(((points[check] - centroids[labels[check]]) ** 2).sum(axis=1))
+    n_evals = len(check)
 
-count = 0
-for pair in data_table:
-    count += 1
-    if (pair[0] < x_min):
-        x_min = pair[0]
-    if (pair[0] > x_max):
-        x_max = pair[0]
-    if (pair[1] < y_min):
-        y_min = pair[1]
-    if (pair[1] > y_max):
-        y_max = pair[1]
-    x_avg = (x_avg * (count - 1) + pair[0]) / count
-    y_avg = (y_avg * (count - 1) + pair[1]) / count
+    #### points still in doubt get compared against every centroid
+    check = check[upper[check] > bound[check]]
+    if len(check) > 0:
+        labels[check], upper[check], lower[check] = nearest_two_centroids(points[check], centroids)
+        n_evals += len(check) * n_clusters
 
+    return n_evals
 
-old_k0 = [0, 0]
-old_k1 = [0, 0]
-old_k2 = [0, 0]
 
-k0 = [x_min, y_min]
-k1 = [x_max, y_max]
-k2 = [x_max, y_avg]
 
-k_list = []
 
-# build initial list
-for pair in data_table:
-    dist_k0 = math.sqrt((pair[0] - k0[0]) ** 2 + (pair[1] - k0[1]) ** 2)
-    dist_k1 = math.sqrt((pair[0] - k1[0]) ** 2 + (pair[1] - k1[1]) ** 2)
-    dist_k2 = math.sqrt((pair[0] - k2[0]) ** 2 + (pair[1] - k2[1]) ** 2)
+#######################
+#   Incremental assignment step: only points that could have changed cluster are re-examined.
+#   Each point keeps an upper bound on the distance to its own centroid and a lower bound on the distance to every
+#   other centroid, loosened each step only by how far the moved centroids moved (as in hamerly_assign).  A point
+#   whose upper bound is still below its lower bound cannot change cluster and is skipped; the rest get their upper
+#   bound tightened (1 distance) and are skipped if that settles it.  A point still in doubt whose own centroid did
+#   not move is still at the same distance from it, and the other centroids that did not move are no closer than
+#   before, so it can only change to one of the moved centroids: it is compared against those alone.  Only the
+#   points still in doubt that are owned by a moved centroid are compared against all K centroids.
+#   With every moved centroid counted as moved this gives the same assignment as comparing every point with every
+#   centroid (see the KMeans move_threshold setting for ignoring small moves).
+#
+#   inputs: points: N x D array of points
+#           centroids: K x D array of the new centroids
+#           moved: boolean array, True for each centroid treated as moved
+#           shifts: how far each centroid moved in the last update
+#           labels, upper, lower: current cluster numbers and bounds, updated in place
+#   outputs: changed: numbers of the points that changed cluster
+#            old_labels: the cluster each changed point was in before
+#            n_evals: number of point-to-centroid distances computed
+######################
+
+def incremental_assign(points, centroids, moved, shifts, labels, upper, lower):
+    moved_clusters = numpy.flatnonzero(moved)
+    if len(moved_clusters) == 0:
+        return numpy.zeros(0, dtype=numpy.intp), numpy.zeros(0, dtype=numpy.intp), 0
+
+    #### loosen the bounds by how far the moved centroids moved
+    upper += numpy.where(moved, shifts, 0.0)[labels]
+    lower -= shifts[moved_clusters].max()
+
+    #### tighten the upper bound of the points in doubt (equal bounds stay in doubt, a tie can change cluster)
+    check = numpy.flatnonzero(upper >= lower)
+    own_sq_dist = ((points[check] - centroids[labels[check]]) ** 2).sum(axis=1)
+    upper[check] = numpy.sqrt(own_sq_dist)
+    n_evals = len(check)
+
+    in_doubt = upper[check] >= lower[check]
+    check = check[in_doubt]
+    own_sq_dist = own_sq_dist[in_doubt]
+    owner_moved = moved[labels[check]]
+    recheck = check[owner_moved]
+    still = check[~owner_moved]
+    still_dist = own_sq_dist[~owner_moved]
+
+    #### points of a moved centroid: compare against every centroid
+    recheck_labels, recheck_upper, recheck_lower = nearest_two_centroids(points[recheck], centroids)
+
+    #### points of a centroid that stayed: only a moved centroid can have come closer (ties go to the smaller
+    #### cluster number, as in a full comparison)
+    nearest_moved, moved_dist, second_moved = nearest_two_centroids(points[still], centroids[moved_clusters],
+                                                                     squared=True)
+    nearest_moved = moved_clusters[nearest_moved]
+    closer = (moved_dist < still_dist) | ((moved_dist == still_dist) & (nearest_moved < labels[still]))
+
+    #### the other centroids of a point that stays are no nearer than its nearest moved centroid or its old bound;
+    #### a point that moves also has its old centroid and the second nearest moved centroid as others
+    still_lower = numpy.minimum(lower[still], numpy.sqrt(numpy.where(closer, second_moved, moved_dist)))
+    still_lower[closer] = numpy.minimum(still_lower[closer], numpy.sqrt(still_dist[closer]))
+    lower[still] = still_lower
+    n_evals += len(recheck) * len(centroids) + len(still) * len(moved_clusters)
+
+    still = still[closer]
+    changed = numpy.concatenate((recheck[recheck_labels != labels[recheck]], still))
+    old_labels = labels[changed]
+
+    labels[recheck] = recheck_labels
+    upper[recheck] = recheck_upper
+    lower[recheck] = recheck_lower
+    labels[still] = nearest_moved[closer]
+    upper[still] = numpy.sqrt(moved_dist[closer])
+
+    return changed, old_labels, n_evals
+
+
+
+
+#######################
+#   Update the cluster counts and sums for the points that changed cluster, instead of summing every point again:
+#   each changed point is taken off its old cluster and added to its new one
+#
+#   inputs: points: N x D array of points
+#           changed: numbers of the points that changed cluster
+#           old_labels, new_labels: cluster of each changed point before and after
+#           k_counter, k_sums: number of points and coordinate sums of each cluster, updated in place
+######################
+
+def update_cluster_sums(points, changed, old_labels, new_labels, k_counter, k_sums):
+    if len(changed) == 0:
+        return
+    n_clusters = len(k_counter)
+    k_counter -= numpy.bincount(old_labels, minlength=n_clusters)
+    k_counter += numpy.bincount(new_labels, minlength=n_clusters)
+    for d in range(points.shape[1]):
+        coordinates = points[changed, d]
+        k_sums[:, d] -= numpy.bincount(old_labels, weights=coordinates, minlength=n_clusters)
+        k_sums[:, d] += numpy.bincount(new_labels, weights=coordinates, minlength=n_clusters)
+
+
+
+
+#######################
+#   Deterministic initial centroids from the extremes and the average of the data:
+#   [min of every coordinate], [max of every coordinate], [max of first coordinate, average of the rest].
+#   For more than 3 clusters the extra centroids are spaced evenly along the line between the min and max corners.
+#
+#   inputs: points: N x D array of points
+#           n_clusters: number of centroids to make
+#           rng: numpy random generator (not used, this method is deterministic)
+#   outputs: centroids: K x D array of initial centroids
+######################
+
+def init_extremes(points, n_clusters, rng):
+    p_min = points.min(axis=0)
+    p_max = points.max(axis=0)
+    p_avg = points.mean(axis=0)
+
+    max_avg = p_avg.copy()
+    max_avg[0] = p_max[0]
+
+    centroids = [p_min, p_max, max_avg]
+    for step in range(1, n_clusters - 2):
+        centroids.append(p_min + (p_max - p_min) * step / (n_clusters - 2))
+
+    return numpy.array(centroids[:n_clusters], dtype=numpy.float64)
+
+
+
+
+#######################
+#   k-means++ seeding: the first centroid is a random point, and each following centroid is a random point
+#   picked with probability proportional to its squared distance from the nearest centroid chosen so far
+#
+#   inputs: points: N x D array of points
+#           n_clusters: number of centroids to make
+#           rng: numpy random generator
+#           weights: optional weight of each point (used by k-means|| to seed from its weighted candidates)
+#   outputs: centroids: K x D array of initial centroids
+######################
+
+def init_kmeans_plus_plus(points, n_clusters, rng, weights=None):
+    if weights is None:
+        weights = numpy.ones(len(points))
+
+    centroids = numpy.empty((n_clusters, points.shape[1]), dtype=numpy.float64)
+    centroids[0] = points[rng.choice(len(points), p=weights / weights.sum())]
+
+    labels, min_sq_dist = nearest_centroids(points, centroids[:1])
+    for i in range(1, n_clusters):
+        prob = weights * min_sq_dist
+        if prob.sum() > 0:
+            pick = rng.choice(len(points), p=prob / prob.sum())
+        else:   # every point already sits on a centroid
+            pick = rng.choice(len(points), p=weights / weights.sum())
+        centroids[i] = points[pick]
+
+        labels, new_sq_dist = nearest_centroids(points, centroids[i:i + 1])
+        numpy.minimum(min_sq_dist, new_sq_dist, out=min_sq_dist)
+
+    return centroids
+
+
+
+
+#######################
+#   Scalable k-means|| seeding (Bahmani et al.): start from one random point, then for a few rounds sample every
+#   point independently with probability oversampling * d^2 / cost, all at once instead of one centroid at a time.
+#   The candidates are weighted by how many points are closest to them and reduced to K centroids with
+#   weighted k-means++.
+#
+#   inputs: points: N x D array of points
+#           n_clusters: number of centroids to make
+#           rng: numpy random generator
+#           n_rounds: number of sampling rounds
+#           oversampling: expected number of candidates added per round, as a multiple of n_clusters
+#   outputs: centroids: K x D array of initial centroids
+######################
+
+def init_kmeans_parallel(points, n_clusters, rng, n_rounds=5, oversampling=2.0):
+    candidates = points[rng.integers(len(points))][numpy.newaxis, :]
+    labels, min_sq_dist = nearest_centroids(points, candidates)
+
+    for round_number in range(n_rounds):
+        cost = min_sq_dist.sum()
+        if cost == 0:
+            break
+        prob = numpy.minimum(1.0, oversampling * n_clusters * min_sq_dist / cost)
+        new_candidates = points[rng.random(len(points)) < prob]
+        if len(new_candidates) == 0:
+            continue
+        labels, new_sq_dist = nearest_centroids(points, new_candidates)
+        numpy.minimum(min_sq_dist, new_sq_dist, out=min_sq_dist)
+        candidates = numpy.vstack([candidates, new_candidates])
+
+    if len(candidates) <= n_clusters:   # too few candidates, fall back to plain k-means++ on all points
+        return init_kmeans_plus_plus(points, n_clusters, rng)
+
+    labels, min_sq_dist = nearest_centroids(points, candidates)
+    weights = numpy.bincount(labels, minlength=len(candidates)).astype(numpy.float64)
+
+    return init_kmeans_plus_plus(candidates, n_clusters, rng, weights)
+
+
+init_methods = {
+    "extremes": init_extremes,
+    "k-means++": init_kmeans_plus_plus,
+    "k-means||": init_kmeans_parallel,
+}
+
+
+
+
+#######################
+#   Worker side of KMeans restarts: the points are handed to each worker once when it starts (inherited rather
+#   than pickled where processes are forked), then each task runs one restart from its seed
+######################
+
+restart_points = {}
+
+def set_restart_points(points):
+    restart_points["points"] = points
+
 
-    if(dist_k0<dist_k1 and dist_k0<dist_k2):  # assign to k0
-        new_k = 0
-    elif(dist_k1<dist_k0 and dist_k1<dist_k2):  # assign to k1
-        new_k = 1
-    else:  # assign to k2
-        new_k = 2
-    new_set = [new_k, pair[0], pair[1]]
-    k_list.append(new_set)
+def run_restart(model, seed, record_events):
+    events = []
+    callback = (lambda event, info: events.append((event, info))) if record_events else None
+    return model.run_once(restart_points["points"], seed, 1, callback), events
 
 
 
 
-k_new = [[0,0],[0,0],[0,0]]
-k_counter = [0,0,0]
+#######################
+#   k-means clustering for any number of clusters and dimensions
+#
+#   inputs: n_clusters: number of clusters to find
+#           max_iter: most update/assign iterations to run
+#           tol: stop once the centroids move less than this in total (sum of Euclidean shifts)
+#           init: name of the initialization method to use, from init_methods
+#           random_state: seed for the random initialization methods, so runs can be repeated
+#           algorithm: "lloyd" compares every point to every centroid each iteration, "hamerly" keeps distance
+#                      bounds per point and skips the comparisons that cannot change the assignment, "kdtree"
+#                      builds a KD-tree over the centroids each iteration and looks up each point's nearest one
+#                      (faster than "lloyd" for large K in few dimensions, needs scipy), "incremental" keeps
+#                      distance bounds per point like "hamerly", but only re-examines the points of moved centroids
+#                      and the points a moved centroid may have come near enough to take, and updates the cluster
+#                      sums by the points that changed cluster
+#           move_threshold: "incremental" only.  A centroid counts as moved once it is more than this far from where
+#                           it was last counted as moved; 0 counts every move and gives the same clusters as "lloyd",
+#                           a little above 0 skips the points of centroids that are only creeping, at some accuracy
+#           n_init: number of restarts, each from its own seed; the one with the lowest inertia is kept
+#           n_jobs: number of worker processes.  With n_init > 1 the restarts run concurrently, one per worker;
+#                   otherwise the "lloyd" assignment step is split across the workers.  1 runs all in this process.
+#   after fit:
+#           cluster_centers_: K x D array of final centroids
+#           labels_: cluster number of each training point
+#           n_iter_: number of update/assign iterations run
+#           n_reseeded_: number of times an empty cluster had to be moved
+#           n_distance_evals_: point-to-centroid distances computed in each iteration
+#           n_skipped_: point-to-centroid distances skipped in each iteration (counted for "hamerly" and "incremental")
+#           inertia_: sum of squared distances from each point to its centroid
+#           run_inertias_, run_n_iters_: inertia and iteration count of every restart, in seed order
+#   telemetry:
+#           callback: optional function called as callback(event, info) with info a dictionary, for watching where
+#                     the time goes (see TelemetryLog).  Events, each with the restart's "seed":
+#                       "seeding": init method and seconds taken
+#                       "iteration": iteration number, points reassigned, k_delta (total centroid shift),
+#                                    distance evaluations, clusters reseeded and seconds taken
+#                       "run": iterations, inertia and seconds for the whole restart
+#                     Restarts in worker processes send their events back, and they are passed on when all are done.
+######################
+
+class KMeans:
+
+    def __init__(self, n_clusters=3, max_iter=300, tol=.001, init="extremes", random_state=None,
+                 algorithm="lloyd", n_init=1, n_jobs=1, callback=None, move_threshold=0.0):
+        if init not in init_methods:
+            raise ValueError("unknown init method: " + str(init))
+        if algorithm not in ("lloyd", "hamerly", "kdtree", "incremental"):
+            raise ValueError("unknown algorithm: " + str(algorithm))
+        if n_init < 1:
+            raise ValueError("n_init must be at least 1")
+        if n_jobs > 1 and n_init == 1 and algorithm != "lloyd":
+            raise ValueError("a parallel assignment step is only supported with algorithm \"lloyd\"")
+        self.n_clusters = n_clusters
+        self.max_iter = max_iter
+        self.tol = tol
+        self.init = init
+        self.random_state = random_state
+        self.algorithm = algorithm
+        self.n_init = n_init
+        self.n_jobs = n_jobs
+        self.callback = callback
+        self.move_threshold = move_threshold
+
+    # the callback stays in this process when the model is sent to worker processes
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["callback"] = None
+        return state
+
+    def fit(self, points):
+        points = numpy.asarray(points, dtype=numpy.float64)
+        if points.ndim != 2:
+            raise ValueError("points must be an N x D array")
+        if len(points) < self.n_clusters:
+            raise ValueError("need at least n_clusters points")
+
+        if self.n_init == 1:
+            runs = [self.run_once(points, self.random_state, self.n_jobs, self.callback)]
+        else:
+            seeds = numpy.random.default_rng(self.random_state).integers(2 ** 32, size=self.n_init)
+            if self.n_jobs > 1:
+                record_events = self.callback is not None
+                with multiprocessing.Pool(self.n_jobs, initializer=set_restart_points, initargs=(points,)) as pool:
+                    results = pool.starmap(run_restart, [(self, seed, record_events) for seed in seeds])
+                runs = [run for run, events in results]
+                for run, events in results:
+                    for event, info in events:
+                        self.callback(event, info)
+            else:
+                runs = [self.run_once(points, seed, 1, self.callback) for seed in seeds]
+
+        best_run = min(runs, key=lambda run: run["inertia_"])
+        for name, value in best_run.items():
+            setattr(self, name, value)
+        self.run_inertias_ = [run["inertia_"] for run in runs]
+        self.run_n_iters_ = [run["n_iter_"] for run in runs]
+        self.centroid_index_ = None
+        if self.algorithm == "kdtree":    # keep the final centroids' KD-tree for predict
+            self.centroid_index_ = build_centroid_index(self.cluster_centers_)
+        return self
+
+    # one clustering run from one seed, returns the fitted values as a dictionary of attribute names
+    def run_once(self, points, random_state, n_jobs, callback=None):
+        run_start = time.perf_counter()
+        seed = None if random_state is None else int(random_state)
+        rng = numpy.random.default_rng(random_state)
+        k = init_methods[self.init](points, self.n_clusters, rng)
+        if callback is not None:
+            callback("seeding", {"seed": seed, "init": self.init, "seconds": time.perf_counter() - run_start})
+
+        assigner = None
+        if n_jobs > 1:
+            assigner = ParallelAssigner(points, n_jobs)
+            points = assigner.points
+
+        try:
+            # build initial assignment
+            if assigner is not None:
+                k_labels, k_counter, k_sums = assigner.assign(k)
+            elif self.algorithm == "hamerly":
+                k_labels, upper, lower = nearest_two_centroids(points, k)
+                k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+            elif self.algorithm == "kdtree":
+                k_labels = assign_points_kdtree(points, k)
+                k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+            elif self.algorithm == "incremental":
+                k_labels, upper, lower = nearest_two_centroids(points, k)
+                k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+                last_moved = k.copy()    # where each centroid was when it was last counted as moved
+            else:
+                k_labels = assign_points(points, k)
+                k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+
+            n_iter = 0
+            n_reseeded = 0
+            n_distance_evals = []
+            n_skipped = []
+            full_evals = len(points) * self.n_clusters
+            k_delta = self.tol + 1
+
+            while (k_delta > self.tol and n_iter < self.max_iter):   # keep iterating until the centroids settle
+                iteration_start = time.perf_counter()
+                if callback is not None:
+                    previous_labels = numpy.array(k_labels)    # copy, "hamerly" updates the labels in place
+
+                k_new = update_centroids(k_counter, k_sums, k)
+                k_new, n_empty = reseed_empty_clusters(points, k_labels, k_new, k_counter)
+                n_reseeded += n_empty
+
+                #### total Euclidean distance the centroids moved
+                shifts = numpy.sqrt(((k - k_new) ** 2).sum(axis=1))
+                k_delta = shifts.sum()
+                k = k_new
+
+                #### now check if need to move any to new clusters
+                if assigner is not None:
+                    k_labels, k_counter, k_sums = assigner.assign(k)
+                    n_evals = full_evals
+                elif self.algorithm == "hamerly":
+                    n_evals = hamerly_assign(points, k, shifts, k_labels, upper, lower)
+                    k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+                elif self.algorithm == "kdtree":
+                    k_labels = assign_points_kdtree(points, k)
+                    k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+                    n_evals = full_evals
+                elif self.algorithm == "incremental":
+                    moved = numpy.sqrt(((k - last_moved) ** 2).sum(axis=1)) > self.move_threshold
+                    last_moved[moved] = k[moved]
+                    changed, old_labels, n_evals = incremental_assign(points, k, moved, shifts, k_labels, upper,
+                                                                      lower)
+                    update_cluster_sums(points, changed, old_labels, k_labels[changed], k_counter, k_sums)
+                else:
+                    k_labels = assign_points(points, k)
+                    k_counter, k_sums = cluster_sums(points, k_labels, self.n_clusters)
+                    n_evals = full_evals
+                n_distance_evals.append(n_evals)
+                n_skipped.append(full_evals - n_evals)
+                n_iter += 1
+
+                if callback is not None:
+                    callback("iteration", {"seed": seed, "iteration": n_iter,
+                                           "reassigned": int(numpy.count_nonzero(k_labels != previous_labels)),
+                                           "k_delta": float(k_delta), "distance_evals": int(n_evals),
+                                           "reseeded": int(n_empty), "seconds": time.perf_counter() - iteration_start})
+
+            k_labels = numpy.array(k_labels)    # own copy, the shared memory labels go away with the assigner
+            inertia = calc_inertia(points, k_labels, k)
+        finally:
+            if assigner is not None:
+                assigner.close()
+
+        if callback is not None:
+            callback("run", {"seed": seed, "iterations": n_iter, "inertia": float(inertia),
+                             "seconds": time.perf_counter() - run_start})
+
+        return {
+            "cluster_centers_": k,
+            "labels_": k_labels,
+            "n_iter_": n_iter,
+            "n_reseeded_": n_reseeded,
+            "n_distance_evals_": n_distance_evals,
+            "n_skipped_": n_skipped,
+            "inertia_": inertia,
+        }
+
+    def predict(self, points):
+        points = numpy.asarray(points, dtype=numpy.float64)
+        if self.centroid_index_ is not None:
+            return assign_points_kdtree(points, self.cluster_centers_, self.centroid_index_)
+        return assign_points(points, self.cluster_centers_)
+
+    def fit_predict(self, points):
+        return self.fit(points).labels_
+
+
+
+
+#######################
+#   Mini-batch k-means for data that does not fit in memory.  Points are folded in one batch at a time: each batch
+#   is assigned to the current centroids, then every centroid becomes the running mean of all points ever assigned
+#   to it, so a centroid's step size shrinks as it sees more points.  partial_fit can keep folding in new points
+#   later without a full refit.
+#
+#   inputs: n_clusters: number of clusters to find
+#           init: name of the initialization method used on the first batch, from init_methods
+#           random_state: seed for the random initialization methods
+#           batch_size: points per batch when fit is given one array
+#   after fit / partial_fit:
+#           cluster_centers_: K x D array of centroids
+#           counts_: number of points folded into each centroid
+#           n_batches_: number of batches folded in
+######################
+
+class MiniBatchKMeans:
+
+    def __init__(self, n_clusters=3, init="k-means++", random_state=None, batch_size=65536):
+        if init not in init_methods:
+            raise ValueError("unknown init method: " + str(init))
+        self.n_clusters = n_clusters
+        self.init = init
+        self.random_state = random_state
+        self.batch_size = batch_size
+        self.rng = numpy.random.default_rng(random_state)
 
+    def partial_fit(self, points):
+        points = numpy.asarray(points, dtype=numpy.float64)
+        if points.ndim != 2:
+            raise ValueError("points must be an N x D array")
 
-k_delta = 1
+        if not hasattr(self, "cluster_centers_"):   # first batch picks the starting centroids
+            if len(points) < self.n_clusters:
+                raise ValueError("first batch needs at least n_clusters points")
+            self.cluster_centers_ = init_methods[self.init](points, self.n_clusters, self.rng)
+            self.counts_ = numpy.zeros(self.n_clusters, dtype=numpy.int64)
+            self.n_batches_ = 0
 
-while (k_delta > .001):   # see if we are within .001 threshold, otherwise keep iterating
-    k_counter = [0, 0, 0]
-    for coords in k_list:
-        k_counter[coords[0]] += 1
-        k_new[coords[0]][0] += coords[1]
-        k_new[coords[0]][1] += coords[2]
-    k_new[0][0] = k_new[0][0] / k_counter[0]
-    k_new[0][1] = k_new[0][1] / k_counter[0]
-    k_new[1][0] = k_new[1][0] / k_counter[1]
-    k_new[1][1] = k_new[1][1] / k_counter[1]
-    k_new[2][0] = k_new[2][0] / k_counter[2]
-    k_new[2][1] = k_new[2][1] / k_counter[2]
+        k_labels = assign_points(points, self.cluster_centers_)
+        batch_counter, batch_sums = cluster_sums(points, k_labels, self.n_clusters)
 
-    #### calculate Euclidean distances
-    k0_old_new_dist = math.sqrt(((k0[0] - k_new[0][0]) ** 2)+((k0[1] - k_new[0][1]) ** 2))
-    k1_old_new_dist = math.sqrt(((k1[0] - k_new[1][0]) ** 2)+((k1[1] - k_new[1][1]) ** 2))
-    k2_old_new_dist = math.sqrt(((k2[0] - k_new[2][0]) ** 2)+((k2[1] - k_new[2][1]) ** 2))
-    k_delta = k0_old_new_dist+k1_old_new_dist+k2_old_new_dist
-    k0 = k_new[0]
-    k1 = k_new[1]
-    k2 = k_new[2]
+        #### running mean: new centroid = (old count * old centroid + batch sum) / new count
+        new_counts = self.counts_ + batch_counter
+        filled = batch_counter > 0
+        self.cluster_centers_[filled] = ((self.counts_[filled, numpy.newaxis] * self.cluster_centers_[filled]
+                                          + batch_sums[filled]) / new_counts[filled, numpy.newaxis])
+        self.counts_ = new_counts
+        self.n_batches_ += 1
+        return self
 
-    #### now check if need to move any to new clusters
-    for coords in k_list:
-        dist_k0 = math.sqrt((coords[1] - k0[0]) ** 2 + (coords[2] - k0[1]) ** 2)
-        dist_k1 = math.sqrt((coords[1] - k1[0]) ** 2 + (coords[2] - k1[1]) ** 2)
-        dist_k2 = math.sqrt((coords[1] - k2[0]) ** 2 + (coords[2] - k2[1]) ** 2)
-        if (dist_k0 < dist_k1 and dist_k0 < dist_k2):  # assign to k0
-            new_k = 0
-        elif (dist_k1 < dist_k0 and dist_k1 < dist_k2):  # assign to k1
-            new_k = 1
-        else:  # assign to k2
-            new_k = 2
-        if (coords[0] != new_k):
-            coords[0] = new_k
+    # points can be one array (split into batch_size batches) or any iterable of arrays, such as read_data_chunks
+    def fit(self, points):
+        batches = points
+        if isinstance(points, numpy.ndarray):
+            batches = (points[start:start + self.batch_size] for start in range(0, len(points), self.batch_size))
+        for batch in batches:
+            self.partial_fit(batch)
+        return self
 
-counter = 0
+    def predict(self, points):
+        points = numpy.asarray(points, dtype=numpy.float64)
+        return assign_points(points, self.cluster_centers_)
 
-outputfile = open("clusters.txt", "w")
 
 
-for coords in k_list:
-    print("Point number", counter, "belongs to cluster #",coords[0], sep = ' ', file = outputfile)
-    counter += 1
-outputfile.close()
-print ("output file clusters.txt written")
 
+#######################
+#   Write cluster results in bulk: each call formats a whole array of labels with one join and one write,
+#   instead of one print per point.  write can be called again for each chunk when streaming, and the point
+#   numbers keep counting up across calls.
+#
+#   output formats:
+#           "text":   Point number <n> belongs to cluster # <k>, one line per point (the original format)
+#           "labels": just the cluster number, one per line
+#           "binary": raw int32 cluster numbers, readable with numpy.fromfile(name, dtype=numpy.int32)
+#           "csv":    the point's coordinates followed by its cluster number, comma separated
+#
+#   inputs: output_file_name: file to write
+#           output_format: one of output_formats
+#   use as: with ClusterWriter("clusters.txt", "text") as writer:
+#               writer.write(labels, points)
+######################
+
+output_formats = ("text", "labels", "binary", "csv")
+
+class ClusterWriter:
+
+    def __init__(self, output_file_name, output_format="text"):
+        if output_format not in output_formats:
+            raise ValueError("unknown output format: " + str(output_format))
+        self.output_format = output_format
+        self.counter = 0
+        if output_format == "binary":
+            self.outputfile = open(output_file_name, "wb")
+        else:
+            self.outputfile = open(output_file_name, "w", buffering=1 << 20)
+
+    def write(self, labels, points=None):
+        labels = numpy.asarray(labels)
+
+        if self.output_format == "binary":
+            labels.astype(numpy.int32).tofile(self.outputfile)
+        elif self.output_format == "labels":
+            self.outputfile.write("".join(f"{label}\n" for label in labels.tolist()))
+        elif self.output_format == "csv":
+            if points is None:
+                raise ValueError("the csv output format needs the points as well as the labels")
+            columns = [map(repr, column) for column in numpy.asarray(points).T.tolist()]   # format column by column
+            columns.append(map(str, labels.tolist()))
+            self.outputfile.write("".join(line + "\n" for line in map(",".join, zip(*columns))))
+        else:
+            self.outputfile.write("".join(f"Point number {counter} belongs to cluster # {label}\n"
+                                          for counter, label in enumerate(labels.tolist(), self.counter)))
+
+        self.counter += len(labels)
+
+    def close(self):
+        self.outputfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+
+
+#######################
+#   Structured telemetry log: writes each event as one line of JSON with the event name and the seconds since the
+#   log was opened, so a run can be followed (or loaded into a table) without attaching a profiler.
+#   Use as the callback of KMeans, and call it directly for other phases.
+#
+#   inputs: outputfile: open text file to write to, such as sys.stderr
+#   use as: log = TelemetryLog(sys.stderr)
+#           log("parse", {"points": count, "seconds": parse_time})
+######################
+
+class TelemetryLog:
+
+    def __init__(self, outputfile):
+        self.outputfile = outputfile
+        self.start_time = time.perf_counter()
+
+    def __call__(self, event, info):
+        record = {"event": event, "elapsed": time.perf_counter() - self.start_time}
+        record.update(info)
+        self.outputfile.write(json.dumps(record) + "\n")
+        self.outputfile.flush()
+
+
+
+
+##################
+#  main program
+#
+##################
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="k-means clustering of comma separated points")
+    parser.add_argument("data_file", nargs="?", default="places.txt",
+                        help="input points, one per line, or a .npy file made with --convert")
+    parser.add_argument("--clusters", type=int, default=3, help="number of clusters")
+    parser.add_argument("--init", choices=sorted(init_methods), default="extremes", help="initialization method")
+    parser.add_argument("--algorithm", choices=["lloyd", "hamerly", "kdtree", "incremental"], default="lloyd",
+                        help="assignment method for the full (non mini-batch) fit")
+    parser.add_argument("--move-threshold", type=float, default=0.0,
+                        help="incremental algorithm: ignore centroid moves until they add up past this distance")
+    parser.add_argument("--n-init", type=int, default=1, help="number of seeded restarts, the best one is kept")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--seed", type=int, help="random seed for the random initialization methods")
+    parser.add_argument("--minibatch", action="store_true",
+                        help="stream the input in chunks with mini-batch k-means instead of loading it all")
+    parser.add_argument("--batch-size", type=int, default=65536, help="points per chunk in mini-batch mode")
+    parser.add_argument("--output", default="clusters.txt", help="file to write the cluster of each point to")
+    parser.add_argument("--output-format", choices=output_formats, default="text",
+                        help="text: the original sentence per point, labels: one cluster number per line, "
+                             "binary: raw int32 cluster numbers, csv: point coordinates and cluster number")
+    parser.add_argument("--convert", metavar="NPY_FILE",
+                        help="convert data_file to a binary .npy file for faster loading, then exit")
+    parser.add_argument("--telemetry", metavar="LOG_FILE",
+                        help="write timing of each phase and k-means iteration to this file as JSON lines "
+                             "(- for stderr)")
+    args = parser.parse_args()
+    if args.clusters < 1:
+        parser.error("--clusters must be at least 1")
+    if args.n_init < 1:
+        parser.error("--n-init must be at least 1")
+    if args.jobs > 1 and args.n_init == 1 and args.algorithm != "lloyd" and not args.minibatch:
+        parser.error("--jobs with one restart splits the assignment step, which needs --algorithm lloyd "
+                     "(or use --n-init to run restarts in parallel)")
+
+    telemetry = None
+    if args.telemetry == "-":
+        telemetry = TelemetryLog(sys.stderr)
+    elif args.telemetry:
+        telemetry = TelemetryLog(open(args.telemetry, "w"))
 
+    if args.convert:
+        try:
+            count = convert_to_npy(args.data_file, args.convert)
+        except ValueError as error:    # an empty input file
+            parser.error(str(error))
+        print("converted", count, "points to", args.convert)
+        exit(0)
 
+    if args.minibatch:
+        phase_start = time.perf_counter()
+        model = MiniBatchKMeans(n_clusters=args.clusters, init=args.init, random_state=args.seed,
+                                batch_size=args.batch_size)
+        data_chunks = read_data_chunks(args.data_file, args.batch_size)
+        first_chunk = next(data_chunks, numpy.zeros((0, 0)))
+        if len(first_chunk) < args.clusters:    # the first batch picks the starting centroids
+            parser.error(f"--clusters {args.clusters} is more than the {len(first_chunk)} points in the first batch "
+                         f"of {args.data_file}")
+        model.fit(itertools.chain([first_chunk], data_chunks))
+        if telemetry is not None:    # parsing is streamed along with the fit here, so it is timed as part of it
+            telemetry("fit", {"batches": model.n_batches_, "seconds": time.perf_counter() - phase_start})
 
+        phase_start = time.perf_counter()
+        writer = ClusterWriter(args.output, args.output_format)
+        for data_chunk in read_data_chunks(args.data_file, args.batch_size):   # second pass to label the points
+            writer.write(model.predict(data_chunk), data_chunk)
+        if telemetry is not None:
+            telemetry("predict_write", {"seconds": time.perf_counter() - phase_start})
+    else:
+        phase_start = time.perf_counter()
+        data_table, count = read_data_file(args.data_file)
+        if count < args.clusters:
+            parser.error(f"--clusters {args.clusters} is more than the {count} points in {args.data_file}")
+        if telemetry is not None:
+            telemetry("parse", {"points": count, "seconds": time.perf_counter() - phase_start})
 
+        phase_start = time.perf_counter()
+        model = KMeans(n_clusters=args.clusters, init=args.init, random_state=args.seed,
+                       algorithm=args.algorithm, n_init=args.n_init, n_jobs=args.jobs, callback=telemetry,
+                       move_threshold=args.move_threshold)
+        k_labels = model.fit_predict(data_table)
+        print("inertia", model.inertia_, "after", model.n_iter_, "iterations")
+        if telemetry is not None:
+            telemetry("fit", {"iterations": model.n_iter_, "seconds": time.perf_counter() - phase_start})
 
+        phase_start = time.perf_counter()
+        writer = ClusterWriter(args.output, args.output_format)
+        writer.write(k_labels, data_table)
+        if telemetry is not None:
+            telemetry("write", {"points": len(k_labels), "seconds": time.perf_counter() - phase_start})
 
+    writer.close()
+    print ("output file", args.output, "written")